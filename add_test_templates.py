@@ -5,6 +5,7 @@ This script adds test templates to the excel_template table
 
 from app import app, db
 from models import ExcelTemplate
+from db_seed import copy_seed
 from datetime import datetime
 import os
 
@@ -54,29 +55,50 @@ def add_test_templates():
         
         # Create placeholder files
         for template in test_templates:
-            # Create an empty file if it doesn't exist
-            if not os.path.exists(template['file_path']):
-                with open(template['file_path'], 'w') as f:
+            # Create an empty file if it doesn't exist; 'x' mode fails instead
+            # of overwriting, so no separate existence check is needed
+            try:
+                with open(template['file_path'], 'x') as f:
                     f.write("Placeholder for Excel template")
                 print(f"Created placeholder file at {template['file_path']}")
+            except FileExistsError:
+                pass
         
-        # Add test templates to database
-        for template_data in test_templates:
-            template = ExcelTemplate(
-                name=template_data['name'],
-                discipline=template_data['discipline'],
-                phase=template_data['phase'],
-                description=template_data['description'],
-                file_path=template_data['file_path'],
-                created_by=template_data['created_by'],
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
-                is_active=template_data['is_active']
-            )
-            db.session.add(template)
+        # One timestamp for the whole batch
+        now = datetime.utcnow()
         
-        # Commit the changes
+        # On PostgreSQL, COPY the rows straight into the table
+        if db.engine.dialect.name == 'postgresql':
+            columns = ['name', 'discipline', 'phase', 'description', 'file_path',
+                       'created_by', 'created_at', 'updated_at', 'is_active', 'version']
+            rows = [
+                (t['name'], t['discipline'], t['phase'], t['description'], t['file_path'],
+                 t['created_by'], now, now, t['is_active'], 1)
+                for t in test_templates
+            ]
+            
+            conn = db.engine.raw_connection()
+            try:
+                with conn.cursor() as cursor:
+                    copy_seed(cursor, ExcelTemplate.__tablename__, columns, rows)
+                conn.commit()
+                print(f"Added {len(test_templates)} test templates to the database")
+            except Exception as e:
+                conn.rollback()
+                print(f"Error adding test templates: {str(e)}")
+            finally:
+                conn.close()
+            return
+        
+        # Add test templates to database, skipping the unit-of-work bookkeeping
+        templates = [
+            ExcelTemplate(**template_data, created_at=now, updated_at=now)
+            for template_data in test_templates
+        ]
+        
+        # Insert and commit the changes
         try:
+            db.session.bulk_save_objects(templates)
             db.session.commit()
             print(f"Added {len(test_templates)} test templates to the database")
         except Exception as e:
@@ -1,10 +1,17 @@
 import os
+import json
+import time
 import logging
+from os.path import basename
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.pool import Pool
+from sqlalchemy.orm import make_transient_to_detached
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -40,23 +47,30 @@ def inject_session():
     from flask import session
     return dict(session=session)
 
+# Date/time formats shared by the template helpers and filters
+_DATE_FMT = '%Y-%m-%d'
+_DATETIME_FMT = '%Y-%m-%d %H:%M'
+
+def format_date(date):
+    if date:
+        return date.strftime(_DATE_FMT)
+    return "Not specified"
+    
+def format_currency(amount):
+    if amount is None:
+        return "Not specified"
+    return f"{amount:.2f} DH"
+
+# Built once; the helpers don't depend on the request
+_utility_context = dict(
+    format_date=format_date,
+    format_currency=format_currency
+)
+
 @app.context_processor
 def utility_processor():
     """Add utility functions to template context"""
-    def format_date(date):
-        if date:
-            return date.strftime('%Y-%m-%d')
-        return "Not specified"
-        
-    def format_currency(amount):
-        if amount is None:
-            return "Not specified"
-        return f"{amount:.2f} DH"
-        
-    return dict(
-        format_date=format_date,
-        format_currency=format_currency
-    )
+    return _utility_context
 
 # Initialize CSRF protection
 csrf = CSRFProtect(app)
@@ -91,15 +105,54 @@ app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     "pool_recycle": 300,  # recycle connections after 5 minutes
-    "pool_pre_ping": True,  # verify connections before using them
+    "pool_pre_ping": False,  # idle connections are pinged by _ping_idle_connection instead
     "pool_size": 10,  # maximum number of connections to keep persistently
     "max_overflow": 20,  # maximum number of connections to create above pool_size
+    "pool_use_lifo": True,  # reuse the most recently returned (warm) connection first
 }
 
+# Only connections idle for longer than this are pinged on checkout
+POOL_PING_IDLE_SECONDS = 10
+
+@event.listens_for(Pool, "checkin")
+def _record_checkin(dbapi_connection, connection_record):
+    connection_record.info['last_checkin'] = time.monotonic()
+
+@event.listens_for(Pool, "checkout")
+def _ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+    """Verify a pooled connection with SELECT 1 only if it sat idle for a while"""
+    last_checkin = connection_record.info.get('last_checkin')
+    if last_checkin is None or time.monotonic() - last_checkin <= POOL_PING_IDLE_SECONDS:
+        return
+    
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception:
+        # The pool discards this connection and retries with a fresh one
+        raise DisconnectionError()
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+# psycopg2-specific batching: executemany() of INSERTs becomes multi-row VALUES
+# and UPDATE/DELETE executemany() is sent in pages instead of one statement each
+if db_url.startswith("postgresql"):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        "executemany_mode": "values_plus_batch",
+        "insertmanyvalues_page_size": 1000,
+        "executemany_batch_page_size": 500,
+    })
+
 # Upload folder configuration
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Reject oversized request bodies with 413 before the multipart parser reads them
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
 # Initialize database
 db = SQLAlchemy(app)
 
@@ -112,12 +165,8 @@ login_manager.login_message_category = 'info'
 from models import User, Project, ProjectHistory, Notification, HistoricalRate, BulkEstimateImport
 from models import Discipline, Deliverable, EstimationInput, DeliverableUpload
 
-# Initialize database tables
-with app.app_context():
-    db.create_all()
-    
-    # Create default admin user if it doesn't exist
-    from models import User
+def ensure_admin_user():
+    """Create the default admin user if it doesn't exist"""
     admin_user = User.query.filter_by(username='admin').first()
     if not admin_user:
         admin_user = User(
@@ -133,63 +182,87 @@ with app.app_context():
         db.session.add(admin_user)
         db.session.commit()
         app.logger.info("Default admin user created.")
-    
-    # Update all project progress values based on their status
-    from models import Project
+
+def sync_project_progress():
+    """Update all project progress values based on their status"""
     try:
-        projects = Project.query.all()
-        updated_count = 0
+        updated_count = Project.sync_status_based_progress()
         
-        for project in projects:
-            old_progress = project.progress_percentage
-            new_progress = project.calculate_status_based_progress()
-            
-            # Only update if progress is different
-            if abs(old_progress - new_progress) > 0.1:  # Small threshold to avoid floating point issues
-                project.progress_percentage = new_progress
-                updated_count += 1
-        
-        # Commit all changes at once
         if updated_count > 0:
-            db.session.commit()
             app.logger.info(f"Successfully updated progress for {updated_count} projects")
         
+        return updated_count
     except Exception as e:
+        db.session.rollback()
         app.logger.error(f"Error updating project progress: {str(e)}")
+        return 0
+
+@app.cli.command("sync-progress")
+def sync_progress_command():
+    """Recompute status-based progress for all projects (run once per deploy)"""
+    updated_count = sync_project_progress()
+    print(f"Updated progress for {updated_count} projects")
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create any missing database tables and the default admin user"""
+    db.create_all()
+    ensure_admin_user()
+    print("Database tables initialized")
 
-# Import and register blueprints
-from routes.auth import auth_bp
-from routes.projects import projects_bp
-from routes.admin import admin_bp
-from routes.reports import reports_bp
-from routes.users import users_bp
-from routes.api import api_bp
-from routes.deliverables import deliverables_bp
-from routes.excel_templates import excel_templates_bp
-from routes.deliverable_lists import deliverable_lists_bp
-from routes.standard_templates import standard_templates_bp
-from routes.public_excel import public_excel_bp
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(projects_bp)
-app.register_blueprint(admin_bp)
-app.register_blueprint(reports_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(api_bp)
-app.register_blueprint(deliverables_bp)
-app.register_blueprint(excel_templates_bp)
-app.register_blueprint(deliverable_lists_bp)
-app.register_blueprint(standard_templates_bp)
-app.register_blueprint(public_excel_bp)
+# Table creation reflects the whole schema, so it only runs on import when
+# requested; otherwise use 'flask init-db' once per deploy
+with app.app_context():
+    if os.environ.get("FLASK_INIT_DB"):
+        db.create_all()
+    
+    # Seeding the admin and recomputing progress touches whole tables, so it
+    # only runs on boot when explicitly requested instead of in every worker
+    if os.environ.get("RUN_STARTUP_MIGRATIONS") == "1":
+        ensure_admin_user()
+        sync_project_progress()
+
+# Short-lived cache of user column values so load_user doesn't hit the
+# database on every request. Entries are (expires_at, {column: value}).
+# The ORM listeners below only clear the cache in the worker that made the
+# change, so in the other workers a deactivated user, a revoked admin or a
+# role change (is_active, is_admin, role) can still be served from the cache
+# for up to USER_CACHE_TTL seconds. Keep the TTL short to bound that window.
+USER_CACHE_TTL = 5  # seconds
+USER_CACHE_MAX_SIZE = 10000
+_user_cache = {}
+_user_columns = [attr.key for attr in sa_inspect(User).column_attrs]
+
+def invalidate_user_cache(user_id):
+    """Drop a cached user so the next request reloads it from the database"""
+    _user_cache.pop(str(user_id), None)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user_cache(target.id)
 
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached and cached[0] > now:
+        # Rebuild the instance from the cached values and attach it to this
+        # request's session without issuing a SELECT
+        user = User(**cached[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+            _user_cache.clear()
+        _user_cache[user_id] = (now + USER_CACHE_TTL,
+                                {key: getattr(user, key) for key in _user_columns})
+    return user
 
 # Register custom template filters
-import json
 @app.template_filter('fromjson')
 def fromjson_filter(value):
     """Parse a JSON string and return a Python object"""
@@ -207,53 +280,69 @@ def datetime_filter(value):
     """Format a datetime object to string"""
     if not value:
         return ''
-    return value.strftime('%Y-%m-%d %H:%M')
+    return value.strftime(_DATETIME_FMT)
 
 @app.template_filter('basename')
 def basename_filter(value):
     """Extract the base filename from a path"""
     if not value:
         return ''
-    import os
-    return os.path.basename(value)
+    return basename(value)
 
 # Global error handling for database transactions
-from flask import request, g
+from flask import request
 from sqlalchemy.exc import SQLAlchemyError
 
-@app.before_request
-def before_request():
-    """Setup for each request, ensure clean transaction state"""
-    g.db_errors = False
-
-@app.after_request
-def after_request(response):
-    """Clean up after each request"""
-    # If we had a database error during the request
-    if hasattr(g, 'db_errors') and g.db_errors:
-        try:
-            db.session.rollback()
-            app.logger.info("Transaction rolled back due to errors")
-        except Exception as e:
-            app.logger.error(f"Error rolling back transaction: {e}")
+@app.teardown_request
+def rollback_on_error(error):
+    """Roll back the session when a request ends with an unhandled exception
     
-    # If we have a 500 error, try to recover the database connection
-    if response.status_code >= 500:
+    Successful requests need no cleanup here: Flask-SQLAlchemy removes the
+    session at app context teardown, which returns the connection to the pool.
+    """
+    if error is not None:
         try:
             db.session.rollback()
-            app.logger.info("Transaction rolled back due to 500 error")
+            app.logger.info("Transaction rolled back due to unhandled error")
         except Exception as e:
             app.logger.error(f"Error rolling back transaction: {e}")
-    
-    return response
 
 @app.errorhandler(SQLAlchemyError)
 def handle_db_exception(error):
     """Handle database exceptions globally"""
     app.logger.error(f"Database error: {str(error)}")
-    g.db_errors = True
     db.session.rollback()
     return "A database error occurred. Please try again later.", 500
 
-# Import routes after app is initialized
-from routes import *
+def register_blueprints(app):
+    """Import the route modules and register their blueprints
+    
+    Kept out of module import so maintenance scripts that only need the app
+    and db don't pay for loading every route module. Called by main.py.
+    """
+    from routes.auth import auth_bp
+    from routes.projects import projects_bp
+    from routes.admin import admin_bp
+    from routes.reports import reports_bp
+    from routes.users import users_bp
+    from routes.api import api_bp
+    from routes.deliverables import deliverables_bp
+    from routes.excel_templates import excel_templates_bp
+    from routes.deliverable_lists import deliverable_lists_bp
+    from routes.standard_templates import standard_templates_bp
+    from routes.public_excel import public_excel_bp
+    
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(projects_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(deliverables_bp)
+    app.register_blueprint(excel_templates_bp)
+    app.register_blueprint(deliverable_lists_bp)
+    app.register_blueprint(standard_templates_bp)
+    app.register_blueprint(public_excel_bp)
+    
+    # Import routes after app is initialized
+    import routes
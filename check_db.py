@@ -1,16 +1,23 @@
-from app import app, db
-from sqlalchemy import text
+import os
+from sqlalchemy import create_engine, text
 
-with app.app_context():
-    print(f'Using database: {app.config["SQLALCHEMY_DATABASE_URI"]}')
-    
-    # Try connecting to the database
-    try:
-        result = db.session.execute(text('SELECT 1')).scalar()
+# Resolve the database URL the same way app.py does, without importing the app
+db_url = os.environ.get("DATABASE_URL", 'sqlite:///project_estimation.db')
+if db_url.startswith("postgres://"):
+    db_url = db_url.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(db_url)
+
+print(f'Using database: {db_url}')
+
+# Try connecting to the database
+try:
+    with engine.connect() as conn:
+        result = conn.execute(text('SELECT 1')).scalar()
         print(f'Database connection successful: {result}')
         
         # Get tables
-        tables = db.session.execute(text("""
+        tables = conn.execute(text("""
             SELECT table_name 
             FROM information_schema.tables 
             WHERE table_schema = 'public'
@@ -20,6 +27,8 @@ with app.app_context():
         print(f"Found {len(tables)} tables:")
         for table in tables:
             print(f"  - {table[0]}")
-            
-    except Exception as e:
-        print(f'Database connection failed: {e}')
\ No newline at end of file
+        
+except Exception as e:
+    print(f'Database connection failed: {e}')
+finally:
+    engine.dispose()
\ No newline at end of file
@@ -4,6 +4,8 @@ Script to check if there are any revisions in the database
 
 import os
 import sys
+from itertools import groupby
+from sqlalchemy.orm import aliased
 from models import db, Project
 from app import app
 
@@ -12,27 +14,33 @@ def check_revisions():
     Check if there are any revisions in the database
     """
     with app.app_context():
-        # Get all revision projects
-        revisions = Project.query.filter_by(is_revision=True).all()
+        # Get all revision projects together with their parent in one query
+        Parent = aliased(Project)
+        revisions = (db.session.query(Project, Parent)
+                     .outerjoin(Parent, Project.parent_project_id == Parent.id)
+                     .filter(Project.is_revision == True)
+                     .all())
         
         print(f"Found {len(revisions)} revision projects:")
         
-        for revision in revisions:
-            parent = Project.query.get(revision.parent_project_id)
+        for revision, parent in revisions:
             parent_title = parent.title if parent else "Unknown"
             print(f"Revision ID: {revision.id}, Rev #{revision.revision_number}")
             print(f"Title: {revision.title}")
             print(f"Parent ID: {revision.parent_project_id}, Parent Title: {parent_title}")
             print("-" * 50)
             
-        # Get all non-revision projects with revisions
-        parent_projects = Project.query.filter_by(is_revision=False).all()
-        projects_with_revisions = []
-        
-        for project in parent_projects:
-            revisions = Project.query.filter_by(parent_project_id=project.id).all()
-            if revisions:
-                projects_with_revisions.append((project, revisions))
+        # Get all non-revision projects with revisions, joined to their revisions
+        Revision = aliased(Project)
+        rows = (db.session.query(Project, Revision)
+                .join(Revision, Revision.parent_project_id == Project.id)
+                .filter(Project.is_revision == False)
+                .order_by(Project.id, Revision.id)
+                .all())
+        projects_with_revisions = [
+            (project, [rev for _, rev in group])
+            for project, group in groupby(rows, key=lambda row: row[0])
+        ]
         
         print(f"\nFound {len(projects_with_revisions)} parent projects with revisions:")
         
@@ -0,0 +1,71 @@
+"""
+Script to print the column schema of selected tables in one catalog query
+
+Usage: python check_schemas.py [table ...]
+"""
+import os
+import sys
+from itertools import groupby
+
+import psycopg2
+
+DEFAULT_TABLES = ['notification', 'project', 'project_rating']
+
+# Substrings that identify candidate validation/approval date columns on project
+VALIDATION_DATE_HINTS = ('valid', 'approv', 'date')
+
+def fetch_schema(conn, tables):
+    """
+    Return (table_name, column_name, data_type) rows for every public table,
+    with columns filled in only for the requested tables
+    """
+    query = """
+    SELECT t.table_name, c.column_name, c.data_type
+    FROM information_schema.tables t
+    LEFT JOIN information_schema.columns c
+        ON c.table_schema = t.table_schema
+        AND c.table_name = t.table_name
+        AND c.table_name = ANY(%s)
+    WHERE t.table_schema = 'public'
+    ORDER BY t.table_name, c.ordinal_position
+    """
+
+    with conn.cursor() as cursor:
+        cursor.execute(query, (list(tables),))
+        return cursor.fetchall()
+
+def check_schemas(tables):
+    """
+    Print the schema of each requested table and the list of all tables
+    """
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        rows = fetch_schema(conn, tables)
+    finally:
+        conn.close()
+
+    columns_by_table = {
+        table_name: [(col, data_type) for _, col, data_type in group if col]
+        for table_name, group in groupby(rows, key=lambda row: row[0])
+    }
+
+    for table_name in tables:
+        columns = columns_by_table.get(table_name, [])
+        print(f"{table_name} table schema:")
+        for col, data_type in columns:
+            print(f"  - {col} ({data_type})")
+
+        if table_name == 'project':
+            # Check for the validation date field (could be named differently)
+            print("\nPossible validation date columns:")
+            for col, _ in columns:
+                if any(hint in col for hint in VALIDATION_DATE_HINTS):
+                    print(f"  - {col}")
+        print()
+
+    print("All tables in database:")
+    for table_name in columns_by_table:
+        print(f"  - {table_name}")
+
+if __name__ == "__main__":
+    check_schemas(sys.argv[1:] or DEFAULT_TABLES)
@@ -9,22 +9,17 @@ with app.app_context():
     if existing_admin:
         print("Admin user already exists.")
     else:
-        # Create new admin user
-        admin_user = User(
-            username='admin',
-            email='admin@estimatetracker.com',
-            role='Admin',
-            discipline='tools_admin',
-            business_unit='BU1',
-            working_title='System Administrator',
-            is_admin=True
-        )
-        
-        # Set password
-        admin_user.set_password('admin')
-        
-        # Add to database
-        db.session.add(admin_user)
+        # Insert the admin row directly, without building ORM unit-of-work state
+        db.session.bulk_insert_mappings(User, [{
+            'username': 'admin',
+            'email': 'admin@estimatetracker.com',
+            'role': 'Admin',
+            'discipline': 'tools_admin',
+            'business_unit': 'BU1',
+            'working_title': 'System Administrator',
+            'is_admin': True,
+            'password_hash': User.hash_password('admin'),
+        }])
         db.session.commit()
         
         print("Admin user created successfully!")
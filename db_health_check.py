@@ -6,17 +6,35 @@ Runs various tests on the database to check for health and performance issues.
 
 import os
 import sys
+import json
+import argparse
 import logging
-import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from itertools import groupby
+from logging.handlers import QueueHandler, QueueListener
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from sqlalchemy import text, func
 from app import app, db
 
-# Set up logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# Set up logging: records are queued by the checks and formatted/written by
+# a background listener thread, so report output never blocks the queries.
+# force=True replaces the root handler app.py installs on import.
+_log_queue = queue.Queue(-1)
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_listener = QueueListener(_log_queue, _log_handler)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)], force=True)
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
+# Held while a check writes its report so concurrent checks don't interleave
+_report_lock = threading.Lock()
+
 def check_database_type():
     """Check if the app is using PostgreSQL"""
     db_url = app.config['SQLALCHEMY_DATABASE_URI']
@@ -38,29 +56,29 @@ def check_connection():
             logger.error(f"❌ Database connection failed: {e}")
             return False
 
-def get_db_size():
+def get_db_size(conn):
     """Get the size of the database"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT pg_size_pretty(pg_database_size(current_database()));
-            """)).scalar()
-            logger.info(f"📊 Database size: {result}")
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error getting database size: {e}")
-            return None
+    try:
+        result = conn.execute(text("""
+            SELECT pg_size_pretty(pg_database_size(current_database()));
+        """)).scalar()
+    except Exception as e:
+        logger.error(f"❌ Error getting database size: {e}")
+        return None
+    
+    with _report_lock:
+        logger.info(f"📊 Database size: {result}")
+    return result
 
-def get_table_sizes():
+def get_table_sizes(conn):
     """Get sizes of all tables"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
+    try:
+        result = conn.execute(text("""
+            WITH sized AS (
                 SELECT 
                     relname as table_name,
-                    pg_size_pretty(pg_total_relation_size(c.oid)) as total_size,
-                    pg_size_pretty(pg_relation_size(c.oid)) as data_size,
-                    pg_size_pretty(pg_total_relation_size(c.oid) - pg_relation_size(c.oid)) as external_size
+                    pg_total_relation_size(c.oid) as total_bytes,
+                    pg_relation_size(c.oid) as data_bytes
                 FROM 
                     pg_class c
                 LEFT JOIN 
@@ -68,367 +86,481 @@ def get_table_sizes():
                 WHERE 
                     n.nspname = 'public' AND 
                     c.relkind = 'r'
-                ORDER BY 
-                    pg_total_relation_size(c.oid) DESC
-                LIMIT 10;
-            """)).fetchall()
-            
-            logger.info("📊 Table sizes:")
-            for row in result:
-                logger.info(f"  - {row[0]}: {row[1]} (data: {row[2]}, indexes: {row[3]})")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error getting table sizes: {e}")
-            return None
+            )
+            SELECT 
+                table_name,
+                pg_size_pretty(total_bytes) as total_size,
+                pg_size_pretty(data_bytes) as data_size,
+                pg_size_pretty(total_bytes - data_bytes) as external_size
+            FROM 
+                sized
+            ORDER BY 
+                total_bytes DESC
+            LIMIT 10;
+        """)).fetchall()
+    except Exception as e:
+        logger.error(f"❌ Error getting table sizes: {e}")
+        return None
+    
+    with _report_lock:
+        logger.info("📊 Table sizes:")
+        for row in result:
+            logger.info(f"  - {row[0]}: {row[1]} (data: {row[2]}, indexes: {row[3]})")
+    
+    return result
 
-def check_active_connections():
+def get_activity_snapshot(conn):
+    """Read this database's pg_stat_activity rows once, as dicts"""
+    return conn.execute(text("""
+        SELECT 
+            pid, 
+            usename, 
+            application_name,
+            state, 
+            query_start,
+            now() - query_start as age,
+            query
+        FROM 
+            pg_stat_activity
+        WHERE 
+            datname = current_database();
+    """)).mappings().all()
+
+def check_active_connections(snapshot):
     """Check active connections to the database"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT 
-                    count(*) as total_connections,
-                    count(*) FILTER (WHERE state = 'active') as active_connections,
-                    count(*) FILTER (WHERE state = 'idle') as idle_connections,
-                    count(*) FILTER (WHERE state = 'idle in transaction') as idle_in_transaction_connections
-                FROM 
-                    pg_stat_activity
-                WHERE 
-                    datname = current_database();
-            """)).fetchone()
-            
-            logger.info(f"📊 Database connections:")
-            logger.info(f"  - Total: {result[0]}")
-            logger.info(f"  - Active: {result[1]}")
-            logger.info(f"  - Idle: {result[2]}")
-            logger.info(f"  - Idle in transaction: {result[3]}")
-            
-            # Check for long-running transactions
-            long_running = db.session.execute(text("""
-                SELECT 
-                    pid, 
-                    usename, 
-                    application_name,
-                    state, 
-                    pg_size_pretty(pg_xact_commit_timestamp(xmin))::text as transaction_start,
-                    query
-                FROM 
-                    pg_stat_activity
-                WHERE 
-                    datname = current_database()
-                    AND state = 'active'
-                    AND (now() - query_start) > interval '5 minutes'
-                ORDER BY 
-                    query_start;
-            """)).fetchall()
-            
-            if long_running:
-                logger.warning(f"⚠️ Long running queries found ({len(long_running)}):")
-                for row in long_running:
-                    logger.warning(f"  - PID {row[0]} ({row[1]}, {row[2]}): {row[3]} since {row[4]}")
-                    logger.warning(f"    Query: {row[5][:100]}...")
-            else:
-                logger.info("✅ No long running queries found")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking connections: {e}")
-            return None
+    states = Counter(row['state'] for row in snapshot)
+    result = (len(snapshot), states['active'], states['idle'], states['idle in transaction'])
+    
+    # Check for long-running transactions
+    long_running = sorted(
+        (row for row in snapshot
+         if row['state'] == 'active' and row['age'] is not None
+         and row['age'] > timedelta(minutes=5)),
+        key=lambda row: row['query_start']
+    )
+    
+    logger.info(f"📊 Database connections:")
+    logger.info(f"  - Total: {result[0]}")
+    logger.info(f"  - Active: {result[1]}")
+    logger.info(f"  - Idle: {result[2]}")
+    logger.info(f"  - Idle in transaction: {result[3]}")
+    
+    if long_running:
+        logger.warning(f"⚠️ Long running queries found ({len(long_running)}):")
+        for row in long_running:
+            logger.warning(f"  - PID {row['pid']} ({row['usename']}, {row['application_name']}): "
+                           f"{row['state']} since {row['query_start']}")
+            logger.warning(f"    Query: {(row['query'] or '')[:100]}...")
+    else:
+        logger.info("✅ No long running queries found")
+    
+    return result
 
-def check_long_running_queries():
+def check_long_running_queries(snapshot):
     """Check for long running queries"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT 
-                    pid, 
-                    usename, 
-                    query_start, 
-                    extract(epoch from (now() - query_start)) as duration_seconds,
-                    state,
-                    query
-                FROM 
-                    pg_stat_activity
-                WHERE 
-                    datname = current_database()
-                    AND state = 'active'
-                    AND query_start is not null
-                ORDER BY 
-                    duration_seconds DESC
-                LIMIT 5;
-            """)).fetchall()
-            
-            if result:
-                logger.info("📊 Top 5 longest running queries:")
-                for row in result:
-                    duration = f"{row[3]:.1f} seconds"
-                    logger.info(f"  - PID {row[0]} ({row[1]}): {duration} - {row[4]}")
-                    logger.info(f"    Query: {row[5][:100]}...")
-            else:
-                logger.info("✅ No active queries found")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking long running queries: {e}")
-            return None
-
-def check_index_usage():
-    """Check index usage statistics"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT
-                    schemaname || '.' || relname as table,
-                    indexrelname as index,
-                    pg_size_pretty(pg_relation_size(i.indexrelid)) as index_size,
-                    idx_scan as index_scans,
-                    idx_tup_read as tuples_read,
-                    idx_tup_fetch as tuples_fetched
-                FROM
-                    pg_stat_user_indexes ui
-                JOIN
-                    pg_index i ON ui.indexrelid = i.indexrelid
-                WHERE
-                    schemaname = 'public'
-                ORDER BY
-                    idx_scan DESC
-                LIMIT 10;
-            """)).fetchall()
-            
-            if result:
-                logger.info("📊 Top 10 most used indexes:")
-                for row in result:
-                    logger.info(f"  - {row[1]} on {row[0]}: {row[2]}, scans: {row[3]}, reads: {row[4]}, fetches: {row[5]}")
-            else:
-                logger.info("⚠️ No index usage statistics found")
-            
-            # Find unused indexes
-            unused = db.session.execute(text("""
-                SELECT
-                    schemaname || '.' || relname as table,
-                    indexrelname as index,
-                    pg_size_pretty(pg_relation_size(i.indexrelid)) as index_size,
-                    idx_scan as index_scans
-                FROM
-                    pg_stat_user_indexes ui
-                JOIN
-                    pg_index i ON ui.indexrelid = i.indexrelid
-                WHERE
-                    schemaname = 'public'
-                    AND idx_scan = 0
-                    AND i.indisprimary = false
-                    AND i.indisunique = false
-                ORDER BY
-                    pg_relation_size(i.indexrelid) DESC
-                LIMIT 10;
-            """)).fetchall()
-            
-            if unused:
-                logger.warning("⚠️ Unused indexes (excluding primary/unique keys):")
-                for row in unused:
-                    logger.warning(f"  - {row[1]} on {row[0]}: {row[2]}, scans: {row[3]}")
-            else:
-                logger.info("✅ No unused indexes found")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking index usage: {e}")
-            return None
-
-def check_table_bloat():
-    """Check for table bloat (tables that need vacuuming)"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT
-                    schemaname || '.' || relname as table,
-                    n_dead_tup as dead_tuples,
-                    n_live_tup as live_tuples,
-                    round(n_dead_tup::numeric / GREATEST(n_live_tup, 1), 4) * 100 as dead_percentage
-                FROM
-                    pg_stat_user_tables
-                WHERE
-                    schemaname = 'public'
-                    AND n_dead_tup > 0
-                ORDER BY
-                    dead_percentage DESC
-                LIMIT 10;
-            """)).fetchall()
-            
-            if result:
-                logger.info("📊 Tables that might need VACUUM:")
-                for row in result:
-                    logger.info(f"  - {row[0]}: {row[1]} dead tuples ({row[3]:.2f}% of {row[2]} live tuples)")
-                    if row[3] > 20:
-                        logger.warning(f"  ⚠️ {row[0]} has high bloat ({row[3]:.2f}%), consider VACUUM")
-            else:
-                logger.info("✅ No table bloat detected")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking table bloat: {e}")
-            return None
-
-def check_missing_indexes():
-    """Check for potential missing indexes based on table scans"""
-    with app.app_context():
-        try:
-            result = db.session.execute(text("""
-                SELECT
-                    schemaname || '.' || relname as table,
-                    seq_scan as sequential_scans,
-                    idx_scan as index_scans,
-                    n_live_tup as live_tuples
-                FROM
-                    pg_stat_user_tables
-                WHERE
-                    schemaname = 'public'
-                    AND seq_scan > 0
-                    AND (seq_scan > idx_scan OR idx_scan IS NULL)
-                    AND n_live_tup > 100
-                ORDER BY
-                    seq_scan DESC
-                LIMIT 10;
-            """)).fetchall()
-            
-            if result:
-                logger.warning("⚠️ Tables with high sequential scans (possibly missing indexes):")
-                for row in result:
-                    idx_scan_str = "0" if row[2] is None else str(row[2])
-                    logger.warning(f"  - {row[0]}: {row[1]} sequential scans vs {idx_scan_str} index scans, {row[3]} rows")
-            else:
-                logger.info("✅ No tables with excessive sequential scans")
-            
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking for missing indexes: {e}")
-            return None
+    result = sorted(
+        (row for row in snapshot if row['state'] == 'active' and row['query_start'] is not None),
+        key=lambda row: row['age'],
+        reverse=True
+    )[:5]
+    
+    if result:
+        logger.info("📊 Top 5 longest running queries:")
+        for row in result:
+            duration = f"{row['age'].total_seconds():.1f} seconds"
+            logger.info(f"  - PID {row['pid']} ({row['usename']}): {duration} - {row['state']}")
+            logger.info(f"    Query: {(row['query'] or '')[:100]}...")
+    else:
+        logger.info("✅ No active queries found")
+    
+    return result
 
-def check_query_performance():
-    """Run a few common queries and check their performance"""
-    with app.app_context():
-        try:
-            # Common queries to test
-            queries = [
-                ("List all projects", "SELECT * FROM project LIMIT 10"),
-                ("Count projects by status", "SELECT status, COUNT(*) FROM project GROUP BY status"),
-                ("Count users by role", "SELECT role, COUNT(*) FROM \"user\" GROUP BY role"),
-                ("Complex join", """
-                    SELECT p.title, p.status, u.username 
-                    FROM project p
-                    JOIN \"user\" u ON p.created_by = u.id
-                    WHERE p.status = 'Draft'
-                    LIMIT 10
-                """),
-                ("Notification query", """
-                    SELECT n.message, u.username
-                    FROM notification n
-                    JOIN \"user\" u ON n.user_id = u.id
-                    WHERE n.read = false
-                    LIMIT 10
-                """),
-            ]
-            
-            results = []
-            logger.info("📊 Query performance test:")
-            
-            for name, query in queries:
-                start_time = time.time()
-                result = db.session.execute(text(query)).fetchall()
-                end_time = time.time()
-                duration = (end_time - start_time) * 1000  # ms
-                
-                row_count = len(result)
-                results.append((name, duration, row_count))
-                logger.info(f"  - {name}: {duration:.2f}ms for {row_count} rows")
-                
-                if duration > 100:
-                    logger.warning(f"  ⚠️ Slow query: {name} took {duration:.2f}ms")
-            
-            return results
-        except Exception as e:
-            logger.error(f"❌ Error running performance tests: {e}")
-            return None
+def check_activity(conn):
+    """Report connections and long running queries from one pg_stat_activity read"""
+    try:
+        snapshot = get_activity_snapshot(conn)
+    except Exception as e:
+        logger.error(f"❌ Error checking connections: {e}")
+        return None
+    
+    with _report_lock:
+        check_active_connections(snapshot)
+        check_long_running_queries(snapshot)
+    
+    return snapshot
 
-def suggest_optimizations():
-    """Suggest database optimizations based on health check results"""
-    with app.app_context():
-        logger.info("\n🔧 Optimization suggestions:")
-        
-        # Check for missing indexes
-        missing_indexes = db.session.execute(text("""
+def check_index_usage(conn):
+    """Check index usage statistics"""
+    try:
+        result = conn.execute(text("""
             SELECT
                 schemaname || '.' || relname as table,
-                seq_scan as sequential_scans,
+                indexrelname as index,
+                pg_size_pretty(pg_relation_size(i.indexrelid)) as index_size,
                 idx_scan as index_scans,
-                n_live_tup as live_tuples,
-                attname as column
+                idx_tup_read as tuples_read,
+                idx_tup_fetch as tuples_fetched
             FROM
-                pg_stat_user_tables
+                pg_stat_user_indexes ui
             JOIN
-                pg_attribute a ON a.attrelid = relid
+                pg_index i ON ui.indexrelid = i.indexrelid
             WHERE
                 schemaname = 'public'
-                AND seq_scan > idx_scan
-                AND n_live_tup > 100
-                AND a.attnum > 0
-                AND NOT a.attisdropped
             ORDER BY
-                seq_scan DESC,
-                n_live_tup DESC
-            LIMIT
-                20;
+                idx_scan DESC
+            LIMIT 10;
         """)).fetchall()
         
-        if missing_indexes:
-            logger.info("1. Consider adding indexes to these tables/columns:")
-            for row in missing_indexes:
-                logger.info(f"   CREATE INDEX ON {row[0]} ({row[4]});")
+        # Find unused indexes; pg_index is narrowed to valid, non-primary,
+        # non-unique indexes before the join so in-progress builds are skipped
+        unused = conn.execute(text("""
+            WITH idx AS (
+                SELECT indexrelid
+                FROM pg_index
+                WHERE NOT indisprimary
+                    AND NOT indisunique
+                    AND indisvalid
+            ),
+            sized AS (
+                SELECT
+                    ui.schemaname,
+                    ui.relname,
+                    ui.indexrelname,
+                    ui.idx_scan,
+                    pg_relation_size(ui.indexrelid) as size_bytes
+                FROM
+                    pg_stat_user_indexes ui
+                JOIN
+                    idx USING (indexrelid)
+                WHERE
+                    ui.schemaname = 'public'
+                    AND ui.idx_scan = 0
+            )
+            SELECT
+                schemaname || '.' || relname as table,
+                indexrelname as index,
+                pg_size_pretty(size_bytes) as index_size,
+                idx_scan as index_scans
+            FROM
+                sized
+            ORDER BY
+                size_bytes DESC
+            LIMIT 10;
+        """)).fetchall()
+    except Exception as e:
+        logger.error(f"❌ Error checking index usage: {e}")
+        return None
+    
+    with _report_lock:
+        if result:
+            logger.info("📊 Top 10 most used indexes:")
+            for row in result:
+                logger.info(f"  - {row[1]} on {row[0]}: {row[2]}, scans: {row[3]}, reads: {row[4]}, fetches: {row[5]}")
+        else:
+            logger.info("⚠️ No index usage statistics found")
         
-        # Check for bloated tables
-        bloated_tables = db.session.execute(text("""
+        if unused:
+            logger.warning("⚠️ Unused indexes (excluding primary/unique keys):")
+            for row in unused:
+                logger.warning(f"  - {row[1]} on {row[0]}: {row[2]}, scans: {row[3]}")
+        else:
+            logger.info("✅ No unused indexes found")
+    
+    return result
+
+def check_table_bloat(conn):
+    """Check for table bloat (tables that need vacuuming)"""
+    try:
+        result = conn.execute(text("""
             SELECT
                 schemaname || '.' || relname as table,
-                round(n_dead_tup::numeric / GREATEST(n_live_tup, 1), 4) * 100 as dead_percentage
+                n_dead_tup as dead_tuples,
+                n_live_tup as live_tuples,
+                100 * n_dead_tup::float8 / GREATEST(n_live_tup, 1) as dead_percentage
             FROM
                 pg_stat_user_tables
             WHERE
                 schemaname = 'public'
                 AND n_dead_tup > 0
-                AND round(n_dead_tup::numeric / GREATEST(n_live_tup, 1), 4) * 100 > 10
             ORDER BY
                 dead_percentage DESC
-            LIMIT 5;
+            LIMIT 10;
         """)).fetchall()
-        
-        if bloated_tables:
-            logger.info("2. Run VACUUM on these bloated tables:")
-            for row in bloated_tables:
-                logger.info(f"   VACUUM {row[0]};  -- {row[1]:.2f}% bloat")
-        
-        # Check for outdated statistics
-        outdated_stats = db.session.execute(text("""
+    except Exception as e:
+        logger.error(f"❌ Error checking table bloat: {e}")
+        return None
+    
+    with _report_lock:
+        if result:
+            logger.info("📊 Tables that might need VACUUM:")
+            for row in result:
+                logger.info(f"  - {row[0]}: {row[1]} dead tuples ({row[3]:.2f}% of {row[2]} live tuples)")
+                if row[3] > 20:
+                    logger.warning(f"  ⚠️ {row[0]} has high bloat ({row[3]:.2f}%), consider VACUUM")
+        else:
+            logger.info("✅ No table bloat detected")
+    
+    return result
+
+def check_missing_indexes(conn):
+    """Check for potential missing indexes based on table scans"""
+    try:
+        result = conn.execute(text("""
             SELECT
                 schemaname || '.' || relname as table,
-                last_analyze,
-                last_autoanalyze
+                seq_scan as sequential_scans,
+                idx_scan as index_scans,
+                n_live_tup as live_tuples
             FROM
                 pg_stat_user_tables
             WHERE
                 schemaname = 'public'
-                AND (last_analyze IS NULL OR last_analyze < now() - interval '1 day')
-                AND (last_autoanalyze IS NULL OR last_autoanalyze < now() - interval '1 day')
+                AND seq_scan > 0
+                AND (seq_scan > idx_scan OR idx_scan IS NULL)
+                AND n_live_tup > 100
             ORDER BY
-                coalesce(last_analyze, '1970-01-01'::timestamp),
-                coalesce(last_autoanalyze, '1970-01-01'::timestamp)
-            LIMIT 5;
+                seq_scan DESC
+            LIMIT 10;
         """)).fetchall()
+    except Exception as e:
+        logger.error(f"❌ Error checking for missing indexes: {e}")
+        return None
+    
+    with _report_lock:
+        if result:
+            logger.warning("⚠️ Tables with high sequential scans (possibly missing indexes):")
+            for row in result:
+                idx_scan_str = "0" if row[2] is None else str(row[2])
+                logger.warning(f"  - {row[0]}: {row[1]} sequential scans vs {idx_scan_str} index scans, {row[3]} rows")
+        else:
+            logger.info("✅ No tables with excessive sequential scans")
+    
+    return result
+
+# Independent read-only diagnostics, run concurrently by run_diagnostics()
+DIAGNOSTIC_CHECKS = [
+    get_db_size,
+    get_table_sizes,
+    check_index_usage,
+    check_table_bloat,
+    check_missing_indexes,
+]
+
+def _run_check(engine, check):
+    """Run one diagnostic on its own pooled connection"""
+    try:
+        with engine.connect() as conn:
+            return check(conn)
+    except Exception as e:
+        logger.error(f"❌ {check.__name__} failed: {e}")
+        return None
+
+def run_diagnostics():
+    """Run the diagnostic checks in parallel, one connection per check
+    
+    The checks are independent SELECTs against the statistics views, so the
+    total time is roughly that of the slowest one instead of the sum. Each
+    check logs its report under _report_lock so output blocks don't interleave.
+    The pg_stat_activity snapshot is taken before the pool starts, so the
+    checks' own connections aren't counted or listed as running queries.
+    """
+    with app.app_context():
+        engine = db.engine
+    
+    _run_check(engine, check_activity)
+    
+    with ThreadPoolExecutor(max_workers=len(DIAGNOSTIC_CHECKS)) as executor:
+        futures = [executor.submit(_run_check, engine, check) for check in DIAGNOSTIC_CHECKS]
+        for future in as_completed(futures):
+            future.result()
+
+# Common queries to test: (name, tables the query needs, SQL)
+# Only the timing and row count are reported, so each query selects as little
+# as possible to keep wide or TOASTed columns out of the measurement
+PERFORMANCE_QUERIES = [
+    ("List all projects", {'project'}, "SELECT id FROM project LIMIT 10"),
+    ("Count projects by status", {'project'}, "SELECT status, COUNT(*) FROM project GROUP BY status"),
+    ("Count users by role", {'user'}, "SELECT role, COUNT(*) FROM \"user\" GROUP BY role"),
+    ("Complex join", {'project', 'user'}, """
+        SELECT 1
+        FROM project p
+        JOIN \"user\" u ON p.created_by = u.id
+        WHERE p.status = 'Draft'
+        LIMIT 10
+    """),
+    ("Notification query", {'notification', 'user'}, """
+        SELECT 1
+        FROM notification n
+        JOIN \"user\" u ON n.user_id = u.id
+        WHERE n.read = false
+        LIMIT 10
+    """),
+]
+
+def check_query_performance():
+    """Run a few common queries and check their performance
+    
+    Timings come from EXPLAIN ANALYZE, so they measure server execution
+    without shipping result rows to Python.
+    """
+    with app.app_context():
+        try:
+            existing_tables = set(db.session.execute(text("""
+                SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'
+            """)).scalars())
+        except Exception as e:
+            logger.error(f"❌ Error running performance tests: {e}")
+            return None
+        
+        results = []
+        logger.info("📊 Query performance test:")
+        
+        for name, tables, query in PERFORMANCE_QUERIES:
+            missing = tables - existing_tables
+            if missing:
+                logger.info(f"  - {name}: skipped, missing table(s) {', '.join(sorted(missing))}")
+                continue
+            
+            try:
+                plan = db.session.execute(
+                    text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query)
+                ).scalar()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"  ❌ {name} failed: {e}")
+                continue
+            
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            duration = plan[0]['Execution Time']  # ms
+            row_count = plan[0]['Plan']['Actual Rows']
+            
+            results.append((name, duration, row_count))
+            logger.info(f"  - {name}: {duration:.2f}ms for {row_count} rows")
+            
+            if duration > 100:
+                logger.warning(f"  ⚠️ Slow query: {name} took {duration:.2f}ms")
+        
+        return results
+
+def suggest_optimizations(apply=False):
+    """Suggest database optimizations based on health check results
+    
+    With apply=True the suggested indexes and ANALYZE runs are executed too.
+    """
+    index_suggestions = []
+    analyze_tables = []
+    
+    with app.app_context():
+        logger.info("\n🔧 Optimization suggestions:")
+        
+        # Gather missing-index, bloat and stale-statistics candidates in one
+        # pass over pg_stat_user_tables; each row is tagged with its bucket
+        rows = db.session.execute(text("""
+            WITH stats AS (
+                SELECT
+                    relid,
+                    schemaname || '.' || relname as table_name,
+                    seq_scan,
+                    idx_scan,
+                    n_live_tup,
+                    n_dead_tup,
+                    last_analyze,
+                    last_autoanalyze,
+                    100 * n_dead_tup::float8 / GREATEST(n_live_tup, 1) as dead_percentage
+                FROM
+                    pg_stat_user_tables
+                WHERE
+                    schemaname = 'public'
+            ),
+            missing_indexes AS (
+                SELECT
+                    1 as bucket,
+                    row_number() OVER (ORDER BY s.seq_scan DESC, s.n_live_tup DESC) as pos,
+                    s.table_name,
+                    a.attname::text as column_name,
+                    NULL::float8 as dead_percentage
+                FROM
+                    stats s
+                JOIN
+                    pg_attribute a ON a.attrelid = s.relid
+                WHERE
+                    s.seq_scan > s.idx_scan
+                    AND s.n_live_tup > 100
+                    AND a.attnum > 0
+                    AND NOT a.attisdropped
+                    -- Skip columns that already lead a usable index
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM pg_index i
+                        WHERE i.indrelid = s.relid
+                            AND i.indkey[0] = a.attnum
+                            AND i.indisvalid
+                    )
+                ORDER BY
+                    pos
+                LIMIT 20
+            ),
+            bloated_tables AS (
+                SELECT
+                    2 as bucket,
+                    row_number() OVER (ORDER BY dead_percentage DESC) as pos,
+                    table_name,
+                    NULL::text as column_name,
+                    dead_percentage
+                FROM
+                    stats
+                WHERE
+                    n_dead_tup > 0
+                    AND dead_percentage > 10
+                ORDER BY
+                    pos
+                LIMIT 5
+            ),
+            outdated_stats AS (
+                SELECT
+                    3 as bucket,
+                    row_number() OVER (
+                        ORDER BY
+                            coalesce(last_analyze, '1970-01-01'::timestamp),
+                            coalesce(last_autoanalyze, '1970-01-01'::timestamp)
+                    ) as pos,
+                    table_name,
+                    NULL::text as column_name,
+                    NULL::float8 as dead_percentage
+                FROM
+                    stats
+                WHERE
+                    (last_analyze IS NULL OR last_analyze < now() - interval '1 day')
+                    AND (last_autoanalyze IS NULL OR last_autoanalyze < now() - interval '1 day')
+                ORDER BY
+                    pos
+                LIMIT 5
+            )
+            SELECT bucket, pos, table_name, column_name, dead_percentage FROM missing_indexes
+            UNION ALL
+            SELECT bucket, pos, table_name, column_name, dead_percentage FROM bloated_tables
+            UNION ALL
+            SELECT bucket, pos, table_name, column_name, dead_percentage FROM outdated_stats
+            ORDER BY bucket, pos;
+        """).execution_options(stream_results=True, yield_per=100))
         
-        if outdated_stats:
-            logger.info("3. Update statistics for these tables:")
-            for row in outdated_stats:
-                logger.info(f"   ANALYZE {row[0]};")
+        # Rows arrive ordered by bucket, so they can be reported as they stream in
+        for bucket, group in groupby(rows, key=lambda row: row[0]):
+            if bucket == 1:
+                logger.info("1. Consider adding indexes to these tables/columns:")
+                for row in group:
+                    logger.info(f"   CREATE INDEX ON {row[2]} ({row[3]});")
+                    index_suggestions.append((row[2], row[3]))
+            elif bucket == 2:
+                logger.info("2. Run VACUUM on these bloated tables:")
+                for row in group:
+                    logger.info(f"   VACUUM {row[2]};  -- {row[4]:.2f}% bloat")
+            elif bucket == 3:
+                logger.info("3. Update statistics for these tables:")
+                for row in group:
+                    logger.info(f"   ANALYZE {row[2]};")
+                    analyze_tables.append(row[2])
         
         # General recommendations
         logger.info("\n4. General recommendations:")
@@ -436,9 +568,105 @@ def suggest_optimizations():
         logger.info("   - Set up regular VACUUM and ANALYZE operations")
         logger.info("   - Monitor query performance with query execution plans")
         logger.info("   - Use connection pooling for better resource utilization")
+        
+        if apply:
+            apply_optimizations(index_suggestions, analyze_tables)
+
+def _qualified_identifier(name):
+    """Turn 'schema.table' into a safely quoted SQL identifier"""
+    return sql.Identifier(*name.split('.', 1))
+
+# Whether a valid index already has the column as its first key column
+LEADING_INDEX_EXISTS_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = to_regclass(%s)
+            AND a.attname = %s
+            AND i.indisvalid
+    )
+"""
+
+# indisvalid of the index with the given schema and name, if there is one
+INDEX_VALIDITY_SQL = """
+    SELECT i.indisvalid
+    FROM pg_index i
+    WHERE i.indexrelid = to_regclass(quote_ident(%s) || '.' || quote_ident(%s))
+"""
+
+def apply_optimizations(index_suggestions, analyze_tables):
+    """Create suggested indexes concurrently and refresh statistics
+    
+    CREATE INDEX CONCURRENTLY doesn't block writes but can't run inside a
+    transaction, so this uses an autocommit DBAPI connection. A failed
+    concurrent build leaves an invalid index behind, which IF NOT EXISTS
+    would silently keep, so such an index is dropped and built again.
+    Columns that already lead a valid index are skipped. All tables are
+    analyzed with a single multi-table ANALYZE statement.
+    """
+    logger.info("\n🛠 Applying optimizations:")
+    conn = db.engine.raw_connection()
+    try:
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        
+        for table, column in index_suggestions:
+            schema, _, table_name = table.rpartition('.')
+            schema = schema or 'public'
+            index_name = f"idx_{table_name}_{column}"
+            statement = sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ({})").format(
+                sql.Identifier(index_name), _qualified_identifier(table), sql.Identifier(column)
+            )
+            try:
+                cursor.execute(LEADING_INDEX_EXISTS_SQL, (table, column))
+                if cursor.fetchone()[0]:
+                    logger.info(f"   ⏭ {table}.{column} is already indexed, skipping {index_name}")
+                    continue
+                
+                cursor.execute(INDEX_VALIDITY_SQL, (schema, index_name))
+                existing = cursor.fetchone()
+                if existing is not None and not existing[0]:
+                    # Left over from an interrupted concurrent build
+                    cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                        sql.Identifier(schema, index_name)
+                    ))
+                    logger.info(f"   🗑 Dropped invalid index {index_name}")
+                
+                cursor.execute(statement)
+                logger.info(f"   ✅ Created index {index_name}")
+            except Exception as e:
+                logger.error(f"   ❌ Error creating index {index_name}: {e}")
+        
+        if analyze_tables:
+            statement = sql.SQL("ANALYZE {}").format(
+                sql.SQL(', ').join(_qualified_identifier(table) for table in analyze_tables)
+            )
+            try:
+                cursor.execute(statement)
+                logger.info(f"   ✅ Analyzed {len(analyze_tables)} tables")
+            except Exception as e:
+                logger.error(f"   ❌ Error analyzing tables: {e}")
+        
+        cursor.close()
+    finally:
+        conn.close()
 
 def main():
     """Main function to run the database health check"""
+    parser = argparse.ArgumentParser(description="PostgreSQL database health check")
+    parser.add_argument('--apply', action='store_true',
+                        help="create the suggested indexes concurrently and ANALYZE stale tables")
+    args = parser.parse_args()
+    
+    try:
+        run_health_check(args)
+    finally:
+        # Flush any queued log records before exiting
+        _log_listener.stop()
+
+def run_health_check(args):
+    """Run every health check and print optimization suggestions"""
     logger.info("=== PostgreSQL Database Health Check ===")
     
     # Check if using PostgreSQL
@@ -451,17 +679,11 @@ def main():
         sys.exit(1)
     
     # Run all health checks
-    get_db_size()
-    get_table_sizes()
-    check_active_connections()
-    check_long_running_queries()
-    check_index_usage()
-    check_table_bloat()
-    check_missing_indexes()
+    run_diagnostics()
     check_query_performance()
     
     # Suggest optimizations
-    suggest_optimizations()
+    suggest_optimizations(apply=args.apply)
     
     logger.info("\n=== ✅ Database Health Check Completed ===")
 
@@ -0,0 +1,44 @@
+"""
+Helpers for loading seed data into PostgreSQL
+"""
+import io
+
+from psycopg2 import sql
+
+
+def _csv_field(value):
+    """Render one value as a COPY CSV field
+
+    None is written as an unquoted empty field, which COPY loads as NULL;
+    everything else is quoted, so an empty string stays ''
+    """
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_seed(cursor, table, columns, rows):
+    """
+    Load rows into a table with COPY FROM STDIN instead of INSERT statements
+
+    Args:
+        cursor: Open psycopg2 cursor; the caller owns the transaction
+        table (str): Target table name
+        columns (list): Column names, in the same order as each row
+        rows (list): Sequence of tuples to load
+
+    Returns:
+        int: Number of rows copied
+    """
+    # csv.writer quotes None as "" under QUOTE_NONNUMERIC, which COPY loads
+    # as an empty string rather than NULL, so the fields are rendered here
+    buf = io.StringIO(''.join(
+        ','.join(map(_csv_field, row)) + '\n' for row in rows
+    ))
+
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH CSV").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+    )
+    cursor.copy_expert(copy_sql.as_string(cursor), buf)
+    return len(rows)
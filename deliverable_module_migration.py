@@ -12,10 +12,11 @@ Run this script directly to perform the migration.
 
 import os
 import sys
-from datetime import datetime
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import time
+from psycopg2.errors import LockNotAvailable, QueryCanceled
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
 
 # Database URL from environment
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -24,263 +25,290 @@ if not DATABASE_URL:
     print("DATABASE_URL environment variable is not set.")
     sys.exit(1)
 
-# Create engine and session
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
-Base = declarative_base()
-metadata = MetaData()
+# One-shot script: open a plain connection per use instead of keeping a pool
+engine = create_engine(DATABASE_URL, poolclass=NullPool)
 
-def add_columns_to_deliverable_upload():
+def _has_col(conn, table, col):
+    """Check a single column in pg_attribute without reflecting the table"""
+    return conn.execute(text("""
+        SELECT 1
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(:t)
+            AND attname = :c
+            AND NOT attisdropped
+    """), {"t": table, "c": col}).scalar() is not None
+
+def add_columns_to_deliverable_upload(conn):
     """Add phase and version columns to deliverable_upload table"""
     print("Adding phase and version columns to deliverable_upload table...")
     
-    try:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        # Get the deliverable_upload table
-        if 'deliverable_upload' not in metadata.tables:
-            print("Error: deliverable_upload table does not exist")
-            return False
-            
-        deliverable_upload = metadata.tables['deliverable_upload']
-        conn = engine.connect()
-        
-        # Check if phase column exists and add it if not
-        if 'phase' not in deliverable_upload.columns:
-            conn.execute("""ALTER TABLE deliverable_upload ADD COLUMN phase VARCHAR(100) DEFAULT 'Define'""")
-            print("Added phase column")
-        else:
-            print("phase column already exists")
-        
-        # Check if version column exists and add it if not
-        if 'version' not in deliverable_upload.columns:
-            conn.execute("""ALTER TABLE deliverable_upload ADD COLUMN version INTEGER DEFAULT 1""")
-            print("Added version column")
-        else:
-            print("version column already exists")
-        
-        # Update nullable status for project_id and discipline
-        # First set default values for any NULL columns
-        if 'project_id' in deliverable_upload.columns:
-            # Check if there are any nulls in project_id
-            null_project_ids = conn.execute("SELECT COUNT(*) FROM deliverable_upload WHERE project_id IS NULL").fetchone()[0]
-            if null_project_ids > 0:
-                # Get the first project id to use as default
-                first_project = conn.execute("SELECT id FROM project ORDER BY id LIMIT 1").fetchone()
-                if first_project:
-                    default_project_id = first_project[0]
-                    conn.execute(f"UPDATE deliverable_upload SET project_id = {default_project_id} WHERE project_id IS NULL")
-                    print(f"Updated NULL project_ids to default value: {default_project_id}")
-                else:
-                    print("No projects found in database, cannot set default project_id")
-                    return False
-                    
-                # Now alter column to not null
-                conn.execute("ALTER TABLE deliverable_upload ALTER COLUMN project_id SET NOT NULL")
-                print("Made project_id not nullable")
-        
-        # Do the same for discipline
-        if 'discipline' in deliverable_upload.columns:
-            null_disciplines = conn.execute("SELECT COUNT(*) FROM deliverable_upload WHERE discipline IS NULL").fetchone()[0]
-            if null_disciplines > 0:
-                conn.execute("UPDATE deliverable_upload SET discipline = 'General' WHERE discipline IS NULL")
-                print("Updated NULL disciplines to 'General'")
-                
-                # Now alter column to not null
-                conn.execute("ALTER TABLE deliverable_upload ALTER COLUMN discipline SET NOT NULL")
-                print("Made discipline not nullable")
-        
-        # Make phase not nullable once it exists
-        conn.execute("ALTER TABLE deliverable_upload ALTER COLUMN phase SET NOT NULL")
-        
-        # Make version not nullable once it exists
-        conn.execute("ALTER TABLE deliverable_upload ALTER COLUMN version SET NOT NULL")
-        
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error adding columns to deliverable_upload: {e}")
+    # Look up only the columns this step touches, straight from
+    # pg_attribute instead of the information_schema views
+    rows = conn.execute(text("""
+        SELECT attname, NOT attnotnull AS is_nullable
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(:table_name)
+            AND attname = ANY(:column_names)
+            AND NOT attisdropped
+    """), {
+        "table_name": "deliverable_upload",
+        "column_names": ['phase', 'version', 'project_id', 'discipline'],
+    }).fetchall()
+    # project_id and discipline always exist, so no rows means no table
+    if not rows:
+        print("Error: deliverable_upload table does not exist")
         return False
+    
+    columns = dict(rows)  # column name -> is nullable
+    
+    # Set default values for any NULL project_id and discipline values
+    # before the columns are made not nullable below. The checks and updates
+    # run server-side in one DO block, i.e. one round trip; the first project
+    # is the default project_id and the block fails if there is none.
+    if columns.get('project_id') or columns.get('discipline'):
+        conn.execute(text("""
+            DO $$
+            DECLARE
+                default_project_id INTEGER;
+            BEGIN
+                IF EXISTS (SELECT 1 FROM deliverable_upload WHERE project_id IS NULL) THEN
+                    SELECT id INTO default_project_id FROM project ORDER BY id LIMIT 1;
+                    IF default_project_id IS NULL THEN
+                        RAISE EXCEPTION 'No projects found in database, cannot set default project_id';
+                    END IF;
+                    UPDATE deliverable_upload SET project_id = default_project_id WHERE project_id IS NULL;
+                END IF;
+                UPDATE deliverable_upload SET discipline = 'General' WHERE discipline IS NULL;
+            END $$;
+        """))
+        print("Filled in NULL project_id and discipline values")
+    
+    # Collect every change into one ALTER TABLE so the table is locked
+    # and scanned once. New columns are added NOT NULL with a default,
+    # which fills existing rows without a separate SET NOT NULL pass.
+    alterations = []
+    
+    if 'phase' not in columns:
+        alterations.append("ADD COLUMN IF NOT EXISTS phase VARCHAR(100) NOT NULL DEFAULT 'Define'")
+        print("Adding phase column")
+    else:
+        print("phase column already exists")
+    
+    if 'version' not in columns:
+        alterations.append("ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1")
+        print("Adding version column")
+    else:
+        print("version column already exists")
+    
+    for column_name in ('project_id', 'discipline', 'phase', 'version'):
+        if columns.get(column_name):
+            alterations.append(f"ALTER COLUMN {column_name} SET NOT NULL")
+            print(f"Making {column_name} not nullable")
+    
+    if alterations:
+        conn.execute(text(f"ALTER TABLE deliverable_upload {', '.join(alterations)}"))
+    
+    return True
 
-def add_version_to_excel_template():
+def add_version_to_excel_template(conn):
     """Add version column to excel_template table"""
     print("Adding version column to excel_template table...")
     
-    try:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        # Get the excel_template table
-        if 'excel_template' not in metadata.tables:
-            print("Error: excel_template table does not exist")
-            return False
-            
-        excel_template = metadata.tables['excel_template']
-        conn = engine.connect()
-        
-        # Check if version column exists and add it if not
-        if 'version' not in excel_template.columns:
-            conn.execute("ALTER TABLE excel_template ADD COLUMN version INTEGER DEFAULT 1")
-            conn.execute("UPDATE excel_template SET version = 1")
-            conn.execute("ALTER TABLE excel_template ALTER COLUMN version SET NOT NULL")
-            print("Added version column")
-        else:
-            print("version column already exists")
-        
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error adding version column to excel_template: {e}")
-        return False
+    has_version = _has_col(conn, 'excel_template', 'version')
+    
+    # Check if version column exists and add it if not; a missing table
+    # makes the ALTER fail and aborts the migration. Adding it NOT NULL with
+    # a constant default is a catalog-only change on PostgreSQL 11+.
+    if not has_version:
+        conn.execute(text("ALTER TABLE excel_template ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+        print("Added version column")
+    else:
+        print("version column already exists")
+    
+    return True
+
+# DDL for the new tables, each followed by indexes on its foreign keys
+_DDL_DELIVERABLE_LIST = """
+CREATE TABLE IF NOT EXISTS deliverable_list (
+    id SERIAL PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES project(id) ON DELETE CASCADE,
+    discipline VARCHAR(100) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    file_id INTEGER REFERENCES deliverable_upload(id),
+    status VARCHAR(50) DEFAULT 'Draft',
+    created_by INTEGER NOT NULL REFERENCES "user"(id),
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    completion_percentage FLOAT DEFAULT 0.0,
+    estimated_hours FLOAT DEFAULT 0.0
+);
+CREATE INDEX IF NOT EXISTS ix_deliverable_list_project_id ON deliverable_list (project_id);
+CREATE INDEX IF NOT EXISTS ix_deliverable_list_file_id ON deliverable_list (file_id);
+CREATE INDEX IF NOT EXISTS ix_deliverable_list_created_by ON deliverable_list (created_by);
+"""
+
+_DDL_DELIVERABLE_LIST_ITEM = """
+CREATE TABLE IF NOT EXISTS deliverable_list_item (
+    id SERIAL PRIMARY KEY,
+    list_id INTEGER NOT NULL REFERENCES deliverable_list(id) ON DELETE CASCADE,
+    deliverable_name VARCHAR(255) NOT NULL,
+    description TEXT,
+    deliverable_type VARCHAR(100),
+    estimated_hours FLOAT DEFAULT 0.0,
+    complexity VARCHAR(50) DEFAULT 'Medium',
+    status VARCHAR(50) DEFAULT 'Not Started',
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    is_template_item BOOLEAN DEFAULT FALSE,
+    sequence INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_deliverable_list_item_list_id ON deliverable_list_item (list_id);
+"""
+
+_DDL_STANDARD_DELIVERABLE_TEMPLATE = """
+CREATE TABLE IF NOT EXISTS standard_deliverable_template (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    discipline VARCHAR(100) NOT NULL,
+    phase VARCHAR(100) NOT NULL,
+    description TEXT,
+    created_by INTEGER NOT NULL REFERENCES "user"(id),
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    is_active BOOLEAN DEFAULT TRUE
+);
+CREATE INDEX IF NOT EXISTS ix_standard_deliverable_template_created_by ON standard_deliverable_template (created_by);
+"""
+
+_DDL_STANDARD_DELIVERABLE_ITEM = """
+CREATE TABLE IF NOT EXISTS standard_deliverable_item (
+    id SERIAL PRIMARY KEY,
+    template_id INTEGER NOT NULL REFERENCES standard_deliverable_template(id) ON DELETE CASCADE,
+    deliverable_name VARCHAR(255) NOT NULL,
+    description TEXT,
+    deliverable_type VARCHAR(100),
+    estimated_hours FLOAT DEFAULT 0.0,
+    complexity VARCHAR(50) DEFAULT 'Medium',
+    sequence INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_standard_deliverable_item_template_id ON standard_deliverable_item (template_id);
+"""
+
+# Referenced tables come first so the foreign keys resolve
+_DDL_ALL = "".join([
+    _DDL_DELIVERABLE_LIST,
+    _DDL_DELIVERABLE_LIST_ITEM,
+    _DDL_STANDARD_DELIVERABLE_TEMPLATE,
+    _DDL_STANDARD_DELIVERABLE_ITEM,
+])
 
-def create_deliverable_list_tables():
-    """Create deliverable_list and deliverable_list_item tables"""
-    print("Creating deliverable list tables...")
+def create_all_new_tables(conn):
+    """Create the deliverable list and standard template tables
     
-    try:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        conn = engine.connect()
-        
-        # Check if deliverable_list table exists
-        if 'deliverable_list' not in metadata.tables:
-            # Create deliverable_list table
-            conn.execute("""
-                CREATE TABLE deliverable_list (
-                    id SERIAL PRIMARY KEY,
-                    project_id INTEGER NOT NULL REFERENCES project(id) ON DELETE CASCADE,
-                    discipline VARCHAR(100) NOT NULL,
-                    name VARCHAR(255) NOT NULL,
-                    file_id INTEGER REFERENCES deliverable_upload(id),
-                    status VARCHAR(50) DEFAULT 'Draft',
-                    created_by INTEGER NOT NULL REFERENCES "user"(id),
-                    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    completion_percentage FLOAT DEFAULT 0.0,
-                    estimated_hours FLOAT DEFAULT 0.0
-                );
-            """)
-            print("Created deliverable_list table")
-        else:
-            print("deliverable_list table already exists")
-        
-        # Refresh metadata to include the new table
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        # Check if deliverable_list_item table exists
-        if 'deliverable_list_item' not in metadata.tables:
-            # Create deliverable_list_item table
-            conn.execute("""
-                CREATE TABLE deliverable_list_item (
-                    id SERIAL PRIMARY KEY,
-                    list_id INTEGER NOT NULL REFERENCES deliverable_list(id) ON DELETE CASCADE,
-                    deliverable_name VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    deliverable_type VARCHAR(100),
-                    estimated_hours FLOAT DEFAULT 0.0,
-                    complexity VARCHAR(50) DEFAULT 'Medium',
-                    status VARCHAR(50) DEFAULT 'Not Started',
-                    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    is_template_item BOOLEAN DEFAULT FALSE,
-                    sequence INTEGER DEFAULT 0
-                );
-            """)
-            print("Created deliverable_list_item table")
-        else:
-            print("deliverable_list_item table already exists")
-        
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error creating deliverable list tables: {e}")
-        return False
+    All four tables and their foreign key indexes are created by a single
+    statement batch. Referenced tables come first: deliverable_list before
+    deliverable_list_item, standard_deliverable_template before
+    standard_deliverable_item. Foreign keys are indexed while the tables are
+    still empty, so lookups and cascading deletes avoid seq scans.
+    """
+    print("Creating deliverable list and standard template tables...")
+    
+    conn.execute(text(_DDL_ALL))
+    print("Ensured deliverable_list, deliverable_list_item, "
+          "standard_deliverable_template and standard_deliverable_item tables")
+    
+    return True
+
+# Steps run in order; each returns False on a handled failure
+MIGRATION_STEPS = [
+    # Add columns to existing tables
+    (add_columns_to_deliverable_upload, "Failed to update deliverable_upload table."),
+    (add_version_to_excel_template, "Failed to update excel_template table."),
+    # Create new tables
+    (create_all_new_tables, "Failed to create deliverable list and standard template tables."),
+]
 
-def create_standard_template_tables():
-    """Create standard_deliverable_template and standard_deliverable_item tables"""
-    print("Creating standard template tables...")
+# ALTER TABLE waits for an ACCESS EXCLUSIVE lock and every other query on the
+# table queues behind it, so give up quickly and retry with backoff instead
+LOCK_TIMEOUT = '5s'
+STATEMENT_TIMEOUT = '60s'
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 2  # seconds, doubled after each attempt
+
+def migration_applied(conn):
+    """Check whether a previous run already committed this migration
+    
+    The steps commit together and standard_deliverable_item is created last,
+    so its presence (plus deliverable_upload.version) means the rest exists.
+    """
+    return conn.execute(text("""
+        SELECT to_regclass('standard_deliverable_item') IS NOT NULL
+            AND EXISTS (
+                SELECT 1
+                FROM pg_attribute
+                WHERE attrelid = to_regclass('deliverable_upload')
+                    AND attname = 'version'
+                    AND NOT attisdropped
+            )
+    """)).scalar()
+
+def apply_migration_steps():
+    """Run all steps in one transaction
     
-    try:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        conn = engine.connect()
+    Lock and statement timeouts are raised to the caller so the whole
+    transaction can be retried; any other failure rolls back and returns False.
+    """
+    # All steps share one connection and one transaction, so a failing
+    # step leaves the schema untouched
+    with engine.connect() as conn:
+        transaction = conn.begin()
         
-        # Check if standard_deliverable_template table exists
-        if 'standard_deliverable_template' not in metadata.tables:
-            # Create standard_deliverable_template table
-            conn.execute("""
-                CREATE TABLE standard_deliverable_template (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    discipline VARCHAR(100) NOT NULL,
-                    phase VARCHAR(100) NOT NULL,
-                    description TEXT,
-                    created_by INTEGER NOT NULL REFERENCES "user"(id),
-                    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                    is_active BOOLEAN DEFAULT TRUE
-                );
-            """)
-            print("Created standard_deliverable_template table")
-        else:
-            print("standard_deliverable_template table already exists")
+        if migration_applied(conn):
+            transaction.rollback()
+            print("Migration already applied, nothing to do.")
+            return True
         
-        # Refresh metadata to include the new table
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
+        conn.execute(text("""
+            SELECT set_config('lock_timeout', :lock_timeout, true),
+                   set_config('statement_timeout', :statement_timeout, true)
+        """), {"lock_timeout": LOCK_TIMEOUT, "statement_timeout": STATEMENT_TIMEOUT})
         
-        # Check if standard_deliverable_item table exists
-        if 'standard_deliverable_item' not in metadata.tables:
-            # Create standard_deliverable_item table
-            conn.execute("""
-                CREATE TABLE standard_deliverable_item (
-                    id SERIAL PRIMARY KEY,
-                    template_id INTEGER NOT NULL REFERENCES standard_deliverable_template(id) ON DELETE CASCADE,
-                    deliverable_name VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    deliverable_type VARCHAR(100),
-                    estimated_hours FLOAT DEFAULT 0.0,
-                    complexity VARCHAR(50) DEFAULT 'Medium',
-                    sequence INTEGER DEFAULT 0
-                );
-            """)
-            print("Created standard_deliverable_item table")
-        else:
-            print("standard_deliverable_item table already exists")
+        for step, failure_message in MIGRATION_STEPS:
+            try:
+                completed = step(conn)
+            except OperationalError:
+                raise
+            except Exception as e:
+                print(f"Error: {e}")
+                completed = False
+            
+            if not completed:
+                transaction.rollback()
+                print(f"{failure_message} Migration aborted.")
+                return False
         
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error creating standard template tables: {e}")
-        return False
+        transaction.commit()
+    
+    print("Migration completed successfully!")
+    return True
 
 def run_migration():
     """Run the migration script"""
     print("Starting database migration for Deliverables Estimation module...")
     
-    # Add columns to existing tables
-    if not add_columns_to_deliverable_upload():
-        print("Failed to update deliverable_upload table. Migration aborted.")
-        return False
-    
-    if not add_version_to_excel_template():
-        print("Failed to update excel_template table. Migration aborted.")
-        return False
-    
-    # Create new tables
-    if not create_deliverable_list_tables():
-        print("Failed to create deliverable list tables. Migration aborted.")
-        return False
-    
-    if not create_standard_template_tables():
-        print("Failed to create standard template tables. Migration aborted.")
-        return False
-    
-    print("Migration completed successfully!")
-    return True
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return apply_migration_steps()
+        except OperationalError as e:
+            timed_out = isinstance(e.orig, (LockNotAvailable, QueryCanceled))
+            if not timed_out or attempt == MAX_ATTEMPTS:
+                print(f"Error: {e}")
+                print("Migration aborted.")
+                return False
+            
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            print(f"Lock or statement timeout (attempt {attempt}/{MAX_ATTEMPTS}), retrying in {delay}s...")
+            time.sleep(delay)
 
 if __name__ == "__main__":
     run_migration()
\ No newline at end of file
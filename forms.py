@@ -3,31 +3,198 @@ from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField
 from wtforms import SelectField, FloatField, DateField, HiddenField, RadioField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, Optional, ValidationError, NumberRange
-from datetime import datetime
+from wtforms.validators import StopValidation
+from werkzeug.datastructures import FileStorage
+from functools import lru_cache
+import time
+from utils.business_units import get_all_business_units, get_all_programs
 
-class LoginForm(FlaskForm):
+# Business unit and program choices change rarely, so they are built at most
+# once per minute per process instead of on every form instance
+CHOICES_CACHE_SECONDS = 60
+
+def _choices_ttl_bucket():
+    """Cache key that changes every CHOICES_CACHE_SECONDS"""
+    return int(time.time() // CHOICES_CACHE_SECONDS)
+
+# Each form's placeholder is part of the cache key, so forms get a finished,
+# presorted tuple they can assign without copying
+@lru_cache(maxsize=4)
+def _cached_bu_choices(ttl_bucket, placeholder):
+    """Placeholder followed by sorted (value, label) choices for all business units"""
+    return (placeholder,) + tuple((bu, bu) for bu in sorted(get_all_business_units()))
+
+@lru_cache(maxsize=4)
+def _cached_program_choices(ttl_bucket, placeholder):
+    """Placeholder followed by sorted (value, label) choices for all programs"""
+    return (placeholder,) + tuple((p, p) for p in sorted(get_all_programs()))
+
+def invalidate_choice_caches():
+    """Drop cached business unit/program choices after they are edited"""
+    _cached_bu_choices.cache_clear()
+    _cached_program_choices.cache_clear()
+
+# Leading bytes of each binary upload type and the extensions they may carry
+_MAGIC_NUMBERS = (
+    (b'%PDF', frozenset({'pdf'})),
+    (b'PK\x03\x04', frozenset({'docx', 'xlsx'})),
+    (b'\xd0\xcf\x11\xe0', frozenset({'doc', 'xls'})),
+    (b'\x89PNG', frozenset({'png'})),
+    (b'\xff\xd8\xff', frozenset({'jpg', 'jpeg'})),
+)
+# Extensions with no signature; accepted if the header looks like text
+_TEXT_EXTS = frozenset({'txt', 'csv'})
+_MAGIC_READ_SIZE = 4096
+
+class FileMagic(object):
+    """Check that an upload's leading bytes match its file extension
+    
+    Only the first few KB are read from the spooled upload and the stream is
+    rewound, so a renamed or mistyped file is rejected before any view reads
+    or parses it. Use after FastFileAllowed, which checks the extension itself.
+    """
+    def __init__(self, message=None):
+        self.message = message or 'File contents do not match its extension'
+    
+    def __call__(self, form, field):
+        data = field.data
+        if not (isinstance(data, FileStorage) and data):
+            return
+        
+        ext = data.filename.rsplit('.', 1)[-1].lower()
+        stream = data.stream
+        position = stream.tell()
+        header = stream.read(_MAGIC_READ_SIZE)
+        stream.seek(position)
+        
+        for magic, extensions in _MAGIC_NUMBERS:
+            if header.startswith(magic):
+                if ext in extensions:
+                    return
+                raise StopValidation(self.message)
+        
+        # Text files (including CSV with a UTF-8 BOM) never contain NUL bytes
+        if ext in _TEXT_EXTS and b'\x00' not in header:
+            return
+        raise StopValidation(self.message)
+
+class FastFileAllowed(FileAllowed):
+    """FileAllowed that looks the extension up in a frozenset
+    
+    FileAllowed tries filename.endswith('.' + ext) for each allowed extension
+    in turn; this takes the text after the last dot once and does a single
+    set lookup. Same messages as FileAllowed.
+    """
+    def __init__(self, extensions, message=None):
+        self._extset = frozenset(ext.lower() for ext in extensions)
+        super(FastFileAllowed, self).__init__(tuple(sorted(self._extset)), message)
+    
+    def __call__(self, form, field):
+        data = field.data
+        if not (isinstance(data, FileStorage) and data):
+            return
+        
+        _, dot, ext = data.filename.rpartition('.')
+        if dot and ext.lower() in self._extset:
+            return
+        raise StopValidation(self.message or field.gettext(
+            "File does not have an approved extension: {extensions}"
+        ).format(extensions=", ".join(self.upload_set)))
+
+# Shared upload validators; FastFileAllowed and FileMagic hold no per-field
+# state, so one instance can serve every FileField with the same extensions
+_DOC_EXTS = frozenset({'pdf', 'doc', 'docx'})
+_DOC_XLS_EXTS = _DOC_EXTS | {'xls', 'xlsx'}
+_DOC_XLS_TXT_EXTS = _DOC_XLS_EXTS | {'txt'}
+_IMG_EXTS = frozenset({'jpg', 'png', 'jpeg'})
+
+_DOC_VALIDATORS = (FastFileAllowed(_DOC_EXTS, 'Only PDF and Word documents are allowed'), FileMagic())
+_DOC_XLS_VALIDATORS = (FastFileAllowed(_DOC_XLS_EXTS, 'Only PDF, Word, and Excel documents are allowed'), FileMagic())
+_DOC_XLS_TXT_VALIDATORS = (FastFileAllowed(_DOC_XLS_TXT_EXTS, 'Allowed file types: PDF, Word, Excel, Text'), FileMagic())
+_IMG_VALIDATORS = (FastFileAllowed(_IMG_EXTS, 'Images only!'), FileMagic())
+
+# Engineering disciplines as (field key, label)
+_DISCIPLINES = (
+    ('process_sid', 'Process & SID'),
+    ('civil_structure', 'Civil & Structure'),
+    ('piping', 'Piping'),
+    ('mechanical', 'Mechanical'),
+    ('electrical', 'Electrical'),
+    ('instrumentation_control', 'Instrumentation & Control'),
+    ('digitalization', 'Digitalization'),
+    ('engineering_management', 'Engineering Management'),
+    ('environmental', 'Environmental'),
+    ('tools_admin', 'Tools Admin'),
+    ('construction', 'Construction'),
+)
+
+# User discipline keys, plus a placeholder and 'none' for non-engineering users
+_USER_DISCIPLINE_CHOICES = (('', 'Select Discipline'),) + _DISCIPLINES + (('none', 'None'),)
+
+# Discipline reference ratios are stored by label
+_DISCIPLINE_LABEL_CHOICES = tuple((label, label) for _, label in _DISCIPLINES)
+
+# Project phases shared by ProjectForm and ReferenceRatioForm
+_PHASE_CHOICES = (
+    ('Identify', 'Identify (Phase 1)'),
+    ('Evaluate', 'Evaluate (Phase 2)'),
+    ('Define', 'Define (Phase 3)'),
+    ('Design', 'Design (Phase 4)'),
+    ('Build', 'Build (Phase 5)'),
+    ('Commissioning', 'Commissioning and Handover (Phase 6)'),
+    ('Asset Management', 'Asset Management (Phase 7)'),
+    ('Other', 'Other (For special cases)'),
+)
+# Phase key -> display label, for views that show a stored phase
+PHASE_LABEL_BY_KEY = dict(_PHASE_CHOICES)
+
+# 1-5 scale shared by every ProjectRatingForm criterion
+_RATING_CHOICES = tuple(
+    (i, f'{i} - {label}')
+    for i, label in enumerate(('Poor', 'Needs Improvement', 'Adequate', 'Good', 'Excellent'), 1)
+)
+
+class BaseForm(FlaskForm):
+    """Base class for every form in the app
+    
+    Per-form Meta tuning lives here so it applies everywhere. Flask-Babel
+    isn't used, so Flask-WTF's translation wrapper only adds a lookup per
+    message; returning None makes WTForms use its own strings.
+    """
+    class Meta:
+        def get_translations(self, form):
+            return None
+
+class LoginForm(BaseForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
     remember = BooleanField('Remember Me')
     submit = SubmitField('Log In')
     
-class RequestPasswordResetForm(FlaskForm):
+class RequestPasswordResetForm(BaseForm):
+    """Form for requesting a password reset"""
     email = StringField('Email', validators=[DataRequired(), Email()])
     submit = SubmitField('Request Password Reset')
     
-class ResetPasswordForm(FlaskForm):
-    password = PasswordField('New Password', validators=[DataRequired(), Length(min=6)])
-    confirm_password = PasswordField('Confirm New Password', 
-                                    validators=[DataRequired(), EqualTo('password')])
+class ResetPasswordForm(BaseForm):
+    """Form for resetting a password"""
+    password = PasswordField('New Password', validators=[
+        DataRequired(), 
+        Length(min=6, message='Password must be at least 6 characters long.')
+    ])
+    confirm_password = PasswordField('Confirm New Password', validators=[
+        DataRequired(),
+        EqualTo('password', message='Passwords must match.')
+    ])
     submit = SubmitField('Reset Password')
 
-class RegistrationForm(FlaskForm):
+class RegistrationForm(BaseForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=50)])
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired(), Length(min=6)])
     confirm_password = PasswordField('Confirm Password', 
                                      validators=[DataRequired(), EqualTo('password')])
-    role = SelectField('Role', choices=[
+    role = SelectField('Role', choices=(
         ('', 'Select Role'),
         ('PM', 'Project Manager'),
         ('PE', 'Project Engineer'),
@@ -35,54 +202,31 @@ class RegistrationForm(FlaskForm):
         ('HOD', 'Head of Discipline'),
         ('E&D', 'Engineering & Design'),
         ('Admin', 'Administrator')
-    ], validators=[DataRequired()])
-    discipline = SelectField('Discipline', choices=[
-        ('', 'Select Discipline'),
-        ('process_sid', 'Process & SID'),
-        ('civil_structure', 'Civil & Structure'),
-        ('piping', 'Piping'),
-        ('mechanical', 'Mechanical'),
-        ('electrical', 'Electrical'),
-        ('instrumentation_control', 'Instrumentation & Control'),
-        ('digitalization', 'Digitalization'),
-        ('engineering_management', 'Engineering Management'),
-        ('environmental', 'Environmental'),
-        ('tools_admin', 'Tools Admin'),
-        ('construction', 'Construction'),
-        ('none', 'None')
-    ])
-    business_unit = SelectField('Business Unit', choices=[
+    ), validators=[DataRequired()])
+    discipline = SelectField('Discipline', choices=_USER_DISCIPLINE_CHOICES)
+    business_unit = SelectField('Business Unit', choices=(
         ('', 'Select Business Unit'),
         ('BU1', 'Business Unit 1'),
         ('BU2', 'Business Unit 2'),
         ('BU3', 'Business Unit 3'),
         ('BU4', 'Business Unit 4'),
         ('none', 'None')
-    ])
+    ))
     working_title = StringField('Working Title', validators=[Length(max=100)])
     submit = SubmitField('Register')
 
-class ProjectForm(FlaskForm):
+class ProjectForm(BaseForm):
     title = StringField('Project Title', validators=[DataRequired(), Length(max=100)])
     bp_code = StringField('BP Code', validators=[DataRequired(), Length(max=50)])
     wo_number = StringField('WO Number', validators=[DataRequired(), Length(max=50)])
     business_unit = SelectField('Business Unit', validators=[DataRequired()])
     program = SelectField('Program', validators=[Optional()])
-    project_type = SelectField('Project Type', choices=[
+    project_type = SelectField('Project Type', choices=(
         ('OCP', 'OCP'),
         ('Non-OCP', 'Non-OCP')
-    ], validators=[DataRequired()])
+    ), validators=[DataRequired()])
     project_tic = StringField('Project TIC', validators=[Optional()])
-    phase = SelectField('Project Phase', choices=[
-        ('Identify', 'Identify (Phase 1)'),
-        ('Evaluate', 'Evaluate (Phase 2)'),
-        ('Define', 'Define (Phase 3)'),
-        ('Design', 'Design (Phase 4)'),
-        ('Build', 'Build (Phase 5)'),
-        ('Commissioning', 'Commissioning and Handover (Phase 6)'),
-        ('Asset Management', 'Asset Management (Phase 7)'),
-        ('Other', 'Other (For special cases)')
-    ], validators=[DataRequired()])
+    phase = SelectField('Project Phase', choices=_PHASE_CHOICES, validators=[DataRequired()])
     
     custom_phase = StringField('Custom Phase Name', validators=[Optional(), Length(max=100)])
     description = TextAreaField('Project Description', validators=[DataRequired()])
@@ -91,39 +235,22 @@ class ProjectForm(FlaskForm):
     planned_end_date = DateField('Planned End Date', format='%Y-%m-%d', validators=[Optional()])
     
     # Required project documents
-    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    bu_approval_to_bid = FileField('BU Approval to Bid', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    expression_of_needs = FileField('Expression of Needs Document', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    scope_of_work = FileField('Clear Scope of Work', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    execution_schedule = FileField('Schedule of Execution', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx'], 'Only PDF, Word, and Excel documents are allowed')
-    ])
-    execution_strategy = FileField('Work Execution Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    resource_mobilization = FileField('Resource Mobilization Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
+    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=_DOC_VALIDATORS)
+    bu_approval_to_bid = FileField('BU Approval to Bid', validators=_DOC_VALIDATORS)
+    expression_of_needs = FileField('Expression of Needs Document', validators=_DOC_VALIDATORS)
+    scope_of_work = FileField('Clear Scope of Work', validators=_DOC_VALIDATORS)
+    execution_schedule = FileField('Schedule of Execution', validators=_DOC_XLS_VALIDATORS)
+    execution_strategy = FileField('Work Execution Strategy', validators=_DOC_VALIDATORS)
+    resource_mobilization = FileField('Resource Mobilization Strategy', validators=_DOC_VALIDATORS)
     
     def __init__(self, *args, **kwargs):
         super(ProjectForm, self).__init__(*args, **kwargs)
         # Populate business units from the centralized mapping
-        from utils.business_units import get_all_business_units, get_all_programs
-        business_units = get_all_business_units()
-        
-        self.business_unit.choices = [('', 'Select Business Unit')] + [(bu, bu) for bu in sorted(business_units)]
+        ttl_bucket = _choices_ttl_bucket()
+        self.business_unit.choices = _cached_bu_choices(ttl_bucket, ('', 'Select Business Unit'))
         
         # Get all programs for dropdown, regardless of selected BU
-        all_programs = get_all_programs()
-        self.program.choices = [('', 'Select Program (Optional)')] + [(p, p) for p in sorted(all_programs)]
+        self.program.choices = _cached_program_choices(ttl_bucket, ('', 'Select Program (Optional)'))
     submit = SubmitField('Create Project')
     
     def validate_planned_end_date(self, planned_end_date):
@@ -131,119 +258,68 @@ class ProjectForm(FlaskForm):
             if planned_end_date.data < self.planned_start_date.data:
                 raise ValidationError('End date must be after start date')
 
-class DocumentUploadForm(FlaskForm):
+class DocumentUploadForm(BaseForm):
     """Form for uploading required project documents"""
-    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    bu_approval_to_bid = FileField('BU Approval to Bid', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    expression_of_needs = FileField('Expression of Needs Document', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    scope_of_work = FileField('Clear Scope of Work', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    execution_schedule = FileField('Schedule of Execution', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx'], 'Only PDF, Word, and Excel documents are allowed')
-    ])
-    execution_strategy = FileField('Work Execution Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    resource_mobilization = FileField('Resource Mobilization Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
+    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=_DOC_VALIDATORS)
+    bu_approval_to_bid = FileField('BU Approval to Bid', validators=_DOC_VALIDATORS)
+    expression_of_needs = FileField('Expression of Needs Document', validators=_DOC_VALIDATORS)
+    scope_of_work = FileField('Clear Scope of Work', validators=_DOC_VALIDATORS)
+    execution_schedule = FileField('Schedule of Execution', validators=_DOC_XLS_VALIDATORS)
+    execution_strategy = FileField('Work Execution Strategy', validators=_DOC_VALIDATORS)
+    resource_mobilization = FileField('Resource Mobilization Strategy', validators=_DOC_VALIDATORS)
     submit = SubmitField('Save Documents')
 
 
-class EstimateForm(FlaskForm):
-    process_sid_hours = FloatField('Process & SID Hours', default=0)
-    civil_structure_hours = FloatField('Civil & Structure Hours', default=0)
-    piping_hours = FloatField('Piping Hours', default=0)
-    mechanical_hours = FloatField('Mechanical Hours', default=0)
-    electrical_hours = FloatField('Electrical Hours', default=0)
-    instrumentation_control_hours = FloatField('Instrumentation & Control Hours', default=0)
-    digitalization_hours = FloatField('Digitalization Hours', default=0)
-    engineering_management_hours = FloatField('Engineering Management Hours', default=0)
-    environmental_hours = FloatField('Environmental Hours', default=0)
-    tools_admin_hours = FloatField('Tools Admin Hours', default=0)
-    construction_hours = FloatField('Construction Hours', default=0)
+class EstimateForm(BaseForm):
+    # One <key>_hours field per discipline, e.g. process_sid_hours
+    for _key, _label in _DISCIPLINES:
+        locals()[f'{_key}_hours'] = FloatField(f'{_label} Hours', default=0)
     
-    # File upload fields for supporting documentation by discipline
-    process_sid_files = FileField('Process & SID Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    civil_structure_files = FileField('Civil & Structure Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    piping_files = FileField('Piping Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    mechanical_files = FileField('Mechanical Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    electrical_files = FileField('Electrical Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    instrumentation_control_files = FileField('Instrumentation & Control Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    digitalization_files = FileField('Digitalization Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    engineering_management_files = FileField('Engineering Management Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    environmental_files = FileField('Environmental Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    tools_admin_files = FileField('Tools Admin Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
-    construction_files = FileField('Construction Documentation', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt'], 'Allowed file types: PDF, Word, Excel, Text')
-    ])
+    # File upload fields for supporting documentation by discipline, e.g.
+    # process_sid_files; declared after the hours so field order is unchanged
+    for _key, _label in _DISCIPLINES:
+        locals()[f'{_key}_files'] = FileField(f'{_label} Documentation', validators=_DOC_XLS_TXT_VALIDATORS)
+    del _key, _label
     
     # Required project document fields
-    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    bu_approval_to_bid = FileField('BU Approval to Bid', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    expression_of_needs = FileField('Expression of Needs Document', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    scope_of_work = FileField('Clear Scope of Work', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    execution_schedule = FileField('Schedule of Execution', validators=[
-        FileAllowed(['pdf', 'doc', 'docx', 'xls', 'xlsx'], 'Only PDF, Word, and Excel documents are allowed')
-    ])
-    execution_strategy = FileField('Work Execution Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
-    resource_mobilization = FileField('Resource Mobilization Strategy', validators=[
-        FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF and Word documents are allowed')
-    ])
+    func_heads_meeting_mom = FileField('Functional Heads Meeting MOM', validators=_DOC_VALIDATORS)
+    bu_approval_to_bid = FileField('BU Approval to Bid', validators=_DOC_VALIDATORS)
+    expression_of_needs = FileField('Expression of Needs Document', validators=_DOC_VALIDATORS)
+    scope_of_work = FileField('Clear Scope of Work', validators=_DOC_VALIDATORS)
+    execution_schedule = FileField('Schedule of Execution', validators=_DOC_XLS_VALIDATORS)
+    execution_strategy = FileField('Work Execution Strategy', validators=_DOC_VALIDATORS)
+    resource_mobilization = FileField('Resource Mobilization Strategy', validators=_DOC_VALIDATORS)
     
     submit = SubmitField('Save Estimate')
+    
+    def validate(self, extra_validators=None):
+        """Validate the form, then collect the discipline hours in one place
+        
+        Sets hours_by_discipline ({discipline key: hours}, blanks as 0) and
+        total_hours, so views can cost an estimate from these instead of
+        reading the eleven <key>_hours fields one by one.
+        """
+        is_valid = super(EstimateForm, self).validate(extra_validators=extra_validators)
+        self.hours_by_discipline = {
+            key: getattr(self, f'{key}_hours').data or 0.0 for key, _ in _DISCIPLINES
+        }
+        self.total_hours = sum(self.hours_by_discipline.values())
+        return is_valid
 
-class RevisionForm(FlaskForm):
+class RevisionForm(BaseForm):
     revision_reason = TextAreaField('Reason for Revision', validators=[DataRequired()])
     submit = SubmitField('Create Revision')
 
-class ApprovalForm(FlaskForm):
-    action = RadioField('Action', choices=[
+class ApprovalForm(BaseForm):
+    action = RadioField('Action', choices=(
         ('approve', 'Approve Project'),
         ('reject', 'Reject Project')
-    ], validators=[DataRequired()])
+    ), validators=[DataRequired()])
     comments = TextAreaField('Comments')
     submit = SubmitField('Submit Decision')
 
-class ProjectFilterForm(FlaskForm):
-    status = SelectField('Status', choices=[
+class ProjectFilterForm(BaseForm):
+    status = SelectField('Status', choices=(
         ('all', 'All'),
         ('Draft', 'Draft'),
         ('Pending Validation', 'Pending Validation'),
@@ -252,14 +328,14 @@ class ProjectFilterForm(FlaskForm):
         ('Rejected', 'Rejected'),
         ('Completed', 'Completed'),
         ('Archived', 'Archived')
-    ])
-    business_unit = SelectField('Business Unit', choices=[('all', 'All')])
-    program = SelectField('Program', choices=[('all', 'All')])
-    project_type = SelectField('Project Type', choices=[
+    ))
+    business_unit = SelectField('Business Unit', choices=(('all', 'All'),))
+    program = SelectField('Program', choices=(('all', 'All'),))
+    project_type = SelectField('Project Type', choices=(
         ('all', 'All'),
         ('OCP', 'OCP'),
         ('Non-OCP', 'Non-OCP')
-    ])
+    ))
     search = StringField('Search', validators=[Optional()])
     start_date = DateField('From Date', format='%Y-%m-%d', validators=[Optional()])
     end_date = DateField('To Date', format='%Y-%m-%d', validators=[Optional()])
@@ -268,90 +344,85 @@ class ProjectFilterForm(FlaskForm):
     def __init__(self, *args, **kwargs):
         super(ProjectFilterForm, self).__init__(*args, **kwargs)
         # Use the centralized business units mapping
-        from utils.business_units import get_all_business_units, get_all_programs
-        business_units = get_all_business_units()
-        all_programs = get_all_programs()
-        
-        self.business_unit.choices = [('all', 'All')] + [(bu, bu) for bu in sorted(business_units)]
+        ttl_bucket = _choices_ttl_bucket()
+        self.business_unit.choices = _cached_bu_choices(ttl_bucket, ('all', 'All'))
         # Show all programs in the dropdown
-        self.program.choices = [('all', 'All')] + [(p, p) for p in sorted(all_programs)]
+        self.program.choices = _cached_program_choices(ttl_bucket, ('all', 'All'))
 
-class ProfileUpdateForm(FlaskForm):
+class ProfileUpdateForm(BaseForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=50)])
     email = StringField('Email', validators=[DataRequired(), Email()])
     working_title = StringField('Working Title', validators=[Length(max=100)])
-    dashboard_theme = SelectField('Dashboard Theme', choices=[
+    dashboard_theme = SelectField('Dashboard Theme', choices=(
         ('default', 'JESA Blue (Default)'),
         ('ocean', 'Ocean Blue'),
         ('emerald', 'Emerald Green'),
         ('sunset', 'Sunset Orange'),
         ('royal', 'Royal Purple'),
         ('charcoal', 'Charcoal Dark')
-    ])
-    profile_photo = FileField('Update Profile Photo', validators=[
-        FileAllowed(['jpg', 'png', 'jpeg'], 'Images only!')
-    ])
+    ))
+    profile_photo = FileField('Update Profile Photo', validators=_IMG_VALIDATORS)
     current_password = PasswordField('Current Password')
     new_password = PasswordField('New Password', validators=[Optional(), Length(min=6)])
     confirm_password = PasswordField('Confirm New Password', 
                                     validators=[EqualTo('new_password')])
     submit = SubmitField('Update Profile')
 
-class HourlyRateForm(FlaskForm):
-    rate = FloatField('Hourly Rate (DH)', validators=[DataRequired()])
-    effective_date = DateField('Effective Date', format='%Y-%m-%d', 
-                              default=datetime.today, validators=[DataRequired()])
-    submit = SubmitField('Set Rate')
-
-class BulkImportForm(FlaskForm):
+class BulkImportForm(BaseForm):
     file = FileField('CSV File', validators=[
         DataRequired(), 
-        FileAllowed(['csv'], 'CSV files only!')
+        FastFileAllowed(('csv',), 'CSV files only!'),
+        FileMagic('CSV files only!')
     ])
     submit = SubmitField('Upload')
 
-class ReportForm(FlaskForm):
-    report_type = SelectField('Report Type', choices=[
+class ReportForm(BaseForm):
+    report_type = SelectField('Report Type', choices=(
         ('pdf', 'PDF Report'),
         ('ppt', 'PowerPoint Presentation')
-    ], validators=[DataRequired()])
+    ), validators=[DataRequired()])
     include_charts = BooleanField('Include Charts', default=True)
     include_cost = BooleanField('Include Cost Information', default=True)
     include_messages = BooleanField('Include Important Messages', default=True)
     submit = SubmitField('Generate Report')
     
     
-class ProjectRatingForm(FlaskForm):
+class ProjectRatingForm(BaseForm):
     documentation_completeness = RadioField('Documentation Completeness', 
-        choices=[(1, '1 - Poor'), (2, '2 - Needs Improvement'), (3, '3 - Adequate'), (4, '4 - Good'), (5, '5 - Excellent')],
+        choices=_RATING_CHOICES,
         validators=[DataRequired()], coerce=int)
     documentation_clarity = RadioField('Documentation Clarity',
-        choices=[(1, '1 - Poor'), (2, '2 - Needs Improvement'), (3, '3 - Adequate'), (4, '4 - Good'), (5, '5 - Excellent')],
+        choices=_RATING_CHOICES,
         validators=[DataRequired()], coerce=int)
     documentation_quality = RadioField('Documentation Quality',
-        choices=[(1, '1 - Poor'), (2, '2 - Needs Improvement'), (3, '3 - Adequate'), (4, '4 - Good'), (5, '5 - Excellent')],
+        choices=_RATING_CHOICES,
         validators=[DataRequired()], coerce=int)
     scope_definition = RadioField('Scope Definition',
-        choices=[(1, '1 - Poor'), (2, '2 - Needs Improvement'), (3, '3 - Adequate'), (4, '4 - Good'), (5, '5 - Excellent')],
+        choices=_RATING_CHOICES,
         validators=[DataRequired()], coerce=int)
     overall_rating = RadioField('Overall Rating',
-        choices=[(1, '1 - Poor'), (2, '2 - Needs Improvement'), (3, '3 - Adequate'), (4, '4 - Good'), (5, '5 - Excellent')],
+        choices=_RATING_CHOICES,
         validators=[DataRequired()], coerce=int)
     comments = TextAreaField('Additional Comments')
     submit = SubmitField('Submit Rating')
 
 
-class ReferenceRatioForm(FlaskForm):
-    phase = SelectField('Project Phase', choices=[
-        ('Identify', 'Identify (Phase 1)'),
-        ('Evaluate', 'Evaluate (Phase 2)'),
-        ('Define', 'Define (Phase 3)'),
-        ('Design', 'Design (Phase 4)'),
-        ('Build', 'Build (Phase 5)'),
-        ('Commissioning', 'Commissioning and Handover (Phase 6)'),
-        ('Asset Management', 'Asset Management (Phase 7)'),
-        ('Other', 'Other (For special cases)')
-    ], validators=[DataRequired()])
+def _check_ratio_order(low, avg, high):
+    """Raise ValidationError unless low <= avg <= high; skipped if any is missing"""
+    if low is None or avg is None or high is None:
+        return
+    if not (low <= avg <= high):
+        raise ValidationError('Ratios must satisfy low ≤ average ≤ high')
+
+
+class RatioOrderingMixin(object):
+    """Require low_ratio <= avg_ratio <= high_ratio on reference ratio forms"""
+    def validate_high_ratio(self, high_ratio):
+        _check_ratio_order(self.low_ratio.data, self.avg_ratio.data, high_ratio.data)
+
+
+class ReferenceRatioForm(RatioOrderingMixin, BaseForm):
+    phase = SelectField('Project Phase', choices=_PHASE_CHOICES, validators=[DataRequired()])
     low_ratio = FloatField('Low Ratio (as decimal, e.g. 0.02 for 2%)', 
                            validators=[DataRequired(), NumberRange(min=0, max=1)])
     avg_ratio = FloatField('Average Ratio (as decimal, e.g. 0.03 for 3%)', 
@@ -360,28 +431,10 @@ class ReferenceRatioForm(FlaskForm):
                             validators=[DataRequired(), NumberRange(min=0, max=1)])
     description = TextAreaField('Description/Notes')
     submit = SubmitField('Save Reference Ratio')
-    
-    def validate_high_ratio(self, high_ratio):
-        if self.low_ratio.data is not None and self.avg_ratio.data is not None and self.low_ratio.data > self.avg_ratio.data:
-            raise ValidationError("Low ratio must be less than or equal to average ratio")
-        if self.avg_ratio.data is not None and high_ratio.data is not None and self.avg_ratio.data > high_ratio.data:
-            raise ValidationError("Average ratio must be less than or equal to high ratio")
-
-
-class DisciplineReferenceRatioForm(FlaskForm):
-    discipline = SelectField('Discipline', choices=[
-        ('Process & SID', 'Process & SID'),
-        ('Civil & Structure', 'Civil & Structure'),
-        ('Piping', 'Piping'),
-        ('Mechanical', 'Mechanical'),
-        ('Electrical', 'Electrical'),
-        ('Instrumentation & Control', 'Instrumentation & Control'),
-        ('Digitalization', 'Digitalization'),
-        ('Engineering Management', 'Engineering Management'),
-        ('Environmental', 'Environmental'),
-        ('Tools Admin', 'Tools Admin'),
-        ('Construction', 'Construction'),
-    ], validators=[DataRequired()])
+
+
+class DisciplineReferenceRatioForm(RatioOrderingMixin, BaseForm):
+    discipline = SelectField('Discipline', choices=_DISCIPLINE_LABEL_CHOICES, validators=[DataRequired()])
     low_ratio = FloatField('Low Ratio (as decimal)', 
                            validators=[DataRequired(), NumberRange(min=0, max=1)])
     avg_ratio = FloatField('Average Ratio (as decimal)', 
@@ -390,7 +443,7 @@ class DisciplineReferenceRatioForm(FlaskForm):
                             validators=[DataRequired(), NumberRange(min=0, max=1)])
     submit = SubmitField('Save Discipline Ratio')
 
-class HourlyRateForm(FlaskForm):
+class HourlyRateForm(BaseForm):
     """Form for creating and editing hourly rates"""
     name = StringField('Rate Name', validators=[DataRequired(), Length(max=100)])
     rate = FloatField('Rate (DH)', validators=[DataRequired(), NumberRange(min=0)])
@@ -398,47 +451,28 @@ class HourlyRateForm(FlaskForm):
     is_default = BooleanField('Set as Default Rate')
     submit = SubmitField('Save Hourly Rate')
 
-class SystemSettingForm(FlaskForm):
+class SystemSettingForm(BaseForm):
     """Form for managing system settings"""
     setting_key = StringField('Setting Key', validators=[DataRequired(), Length(max=100)])
     setting_value = TextAreaField('Setting Value', validators=[Optional()])
-    setting_type = SelectField('Setting Type', choices=[
+    setting_type = SelectField('Setting Type', choices=(
         ('string', 'Text'),
         ('int', 'Integer'),
         ('float', 'Decimal'),
         ('bool', 'Boolean'),
         ('json', 'JSON')
-    ])
+    ))
     description = TextAreaField('Description', validators=[Optional()])
     submit = SubmitField('Save Setting')
 
-class ProjectMessageForm(FlaskForm):
+class ProjectMessageForm(BaseForm):
     """Form for project chat messages"""
     message = TextAreaField('Message', validators=[DataRequired(), Length(min=1, max=1000)])
     is_important = BooleanField('Mark as Important for Reports', default=False)
     submit = SubmitField('Send Message')
 
 
-class ProjectAssumptionForm(FlaskForm):
+class ProjectAssumptionForm(BaseForm):
     """Form for project assumptions"""
     assumption_text = TextAreaField('Assumption', validators=[DataRequired(), Length(min=1, max=2000)])
     submit = SubmitField('Save Assumption')
-
-
-class RequestPasswordResetForm(FlaskForm):
-    """Form for requesting a password reset"""
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    submit = SubmitField('Request Password Reset')
-
-
-class ResetPasswordForm(FlaskForm):
-    """Form for resetting a password"""
-    password = PasswordField('New Password', validators=[
-        DataRequired(), 
-        Length(min=6, message='Password must be at least 6 characters long.')
-    ])
-    confirm_password = PasswordField('Confirm New Password', validators=[
-        DataRequired(),
-        EqualTo('password', message='Passwords must match.')
-    ])
-    submit = SubmitField('Reset Password')
@@ -3,26 +3,11 @@
 Script to initialize the discipline table with default values.
 This will add standard engineering disciplines to the database.
 """
-import os
 from datetime import datetime
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-
-# Create a minimal Flask app
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-db = SQLAlchemy(app)
-
-# Define model for script
-class Discipline(db.Model):
-    __tablename__ = 'discipline'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False, unique=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import app, db
+from models import Discipline
 
 def init_disciplines():
     """Initialize the discipline table with default values."""
@@ -41,20 +26,21 @@ def init_disciplines():
         "Construction",
     ]
     
-    # Check if disciplines already exist
-    existing_count = Discipline.query.count()
-    if existing_count > 0:
-        print(f"Found {existing_count} existing disciplines. No action taken.")
-        return
-    
-    # Add disciplines
-    for name in disciplines:
-        discipline = Discipline(name=name)
-        db.session.add(discipline)
+    # Add all disciplines in one multi-row INSERT; names that already exist
+    # are skipped, so no existence check is needed and re-runs are safe
+    now = datetime.utcnow()
+    insert = sqlite_insert if db.engine.dialect.name == 'sqlite' else pg_insert
+    stmt = insert(Discipline).values(
+        [{'name': name, 'created_at': now} for name in disciplines]
+    ).on_conflict_do_nothing(index_elements=['name'])
     
     try:
+        added_count = db.session.execute(stmt).rowcount
         db.session.commit()
-        print(f"Successfully added {len(disciplines)} disciplines to the database.")
+        if added_count:
+            print(f"Successfully added {added_count} disciplines to the database.")
+        else:
+            print("All disciplines already exist. No action taken.")
     except Exception as e:
         db.session.rollback()
         print(f"Error adding disciplines: {str(e)}")
@@ -1,4 +1,6 @@
-from app import app
+from app import app, register_blueprints
+
+register_blueprints(app)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
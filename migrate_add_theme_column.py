@@ -22,48 +22,45 @@ def execute_sql(conn, sql, params=None):
 
 def add_column_if_not_exists(conn):
     """Add dashboard_theme column if it doesn't exist"""
-    # Check if column exists
-    check_sql = """
-    SELECT column_name 
-    FROM information_schema.columns 
-    WHERE table_name = 'user' AND column_name = 'dashboard_theme'
-    """
-    
-    with conn.cursor() as cursor:
-        cursor.execute(check_sql)
-        result = cursor.fetchone()
-        
-    if result:
-        print("Column 'dashboard_theme' already exists.")
-        return True
-    
-    # Add the column
+    # IF NOT EXISTS lets the server do the existence check, so there is no
+    # separate catalog query and no race between checking and altering
     add_sql = """
     ALTER TABLE "user" 
-    ADD COLUMN dashboard_theme VARCHAR(50) DEFAULT 'default' NOT NULL
+    ADD COLUMN IF NOT EXISTS dashboard_theme VARCHAR(50) DEFAULT 'default' NOT NULL
     """
     
     success = execute_sql(conn, add_sql)
     if success:
-        print("Successfully added 'dashboard_theme' column to the User table.")
+        print("Column 'dashboard_theme' is present on the User table.")
     else:
         print("Failed to add column.")
     
     return success
 
-def main():
-    """Run the migration"""
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        print("Error: DATABASE_URL environment variable not set.")
-        return False
+def main(conn=None):
+    """Run the migration
     
-    print(f"Connecting to database...")
+    Args:
+        conn: Optional open DB-API connection to reuse, e.g.
+            db.engine.raw_connection() from inside the app, so no new
+            connection (and TCP/TLS handshake) is needed. The caller keeps
+            ownership of it; without one, a connection is opened and closed here.
+    """
+    owns_connection = conn is None
+    if owns_connection:
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            print("Error: DATABASE_URL environment variable not set.")
+            return False
+        
+        print(f"Connecting to database...")
     
     try:
-        conn = psycopg2.connect(database_url)
+        if owns_connection:
+            conn = psycopg2.connect(database_url)
         success = add_column_if_not_exists(conn)
-        conn.close()
+        if owns_connection:
+            conn.close()
         
         if success:
             print("Migration completed successfully.")
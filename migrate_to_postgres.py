@@ -4,15 +4,23 @@ Migration script to transfer data from SQLite to PostgreSQL.
 This script creates a copy of all data from the SQLite database into PostgreSQL.
 """
 
+import io
 import os
 import sys
+import argparse
 import logging
 import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import sqlite3
 import json
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from contextlib import closing
+from itertools import chain, islice
+from pathlib import Path
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
 from app import app, db
 
 # Set up logging
@@ -20,6 +28,36 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Rows fetched from SQLite per fetchmany() and sent to PostgreSQL per
+# executemany() call. The app engine's psycopg2 batching options page these
+# into multi-statement round-trips.
+BATCH_SIZE = 1000
+
+# Batches read ahead from SQLite while the previous ones are being written
+PREFETCH_BATCHES = 4
+
+# Batches committed together with a migration_state checkpoint; a rerun
+# resumes each table after its last committed checkpoint
+CHECKPOINT_BATCHES = 50
+
+# Minimum seconds between progress messages for one table
+PROGRESS_LOG_INTERVAL = 1.0
+
+# Worker processes migrating tables at the same time
+MIGRATION_WORKERS = int(os.environ.get("MIGRATION_WORKERS", os.cpu_count() or 1))
+
+# The SQLite source is only scanned, so its connections are made read-only
+# and given a large page cache and memory-mapped I/O
+SQLITE_READ_PRAGMAS = (
+    "PRAGMA query_only = ON;",
+    "PRAGMA cache_size = -262144;",  # 256 MB
+    "PRAGMA mmap_size = 30000000000;",  # capped by SQLite's compile-time limit
+    "PRAGMA temp_store = MEMORY;",
+)
+
+# maintenance_work_mem for rebuilding the indexes dropped before the load
+INDEX_BUILD_MEMORY = '1GB'
+
 def check_postgres_url():
     """Check if PostgreSQL URL is set"""
     db_url = app.config.get('SQLALCHEMY_DATABASE_URI', '')
@@ -36,20 +74,66 @@ def create_sqlite_connection(sqlite_path):
             logger.error(f"❌ SQLite database file not found: {sqlite_path}")
             sys.exit(1)
             
-        conn = sqlite3.connect(sqlite_path)
-        conn.row_factory = sqlite3.Row
+        # Batches are read on a prefetch thread, not the thread that connected
+        conn = sqlite3.connect(sqlite_path, check_same_thread=False)
+        for pragma in SQLITE_READ_PRAGMAS:
+            conn.execute(pragma)
         logger.info(f"✅ Connected to SQLite database: {sqlite_path}")
         return conn
     except Exception as e:
         logger.error(f"❌ Error connecting to SQLite database: {e}")
         sys.exit(1)
 
+# table name -> (column names, SELECT statement reading those columns)
+_table_meta_cache = {}
+
+def _quote_identifier(name):
+    """Quote a table or column name for use in SQLite SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _build_table_meta(table, columns):
+    """Pair a table's column names with the SELECT that reads them
+    
+    The SELECT returns rowid first, in rowid order, starting after the rowid
+    given as its only parameter.
+    """
+    column_str = ", ".join(map(_quote_identifier, columns))
+    return columns, (f"SELECT rowid, {column_str} FROM {_quote_identifier(table)} "
+                     f"WHERE rowid > ? ORDER BY rowid;")
+
+def table_meta(sqlite_conn, table):
+    """Get a table's column names and the SELECT that reads them, built once per table"""
+    meta = _table_meta_cache.get(table)
+    if meta is None:
+        cursor = sqlite_conn.cursor()
+        try:
+            cursor.execute(f"PRAGMA table_info({_quote_identifier(table)});")
+            columns = [row[1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+        meta = _table_meta_cache[table] = _build_table_meta(table, columns)
+    return meta
+
 def get_tables(sqlite_conn):
-    """Get a list of tables from the SQLite database"""
+    """Get a list of tables from the SQLite database
+    
+    Their columns are read in the same query and cached for table_meta().
+    """
     try:
         cursor = sqlite_conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [row[0] for row in cursor.fetchall() if row[0] != 'sqlite_sequence']
+        cursor.execute("""
+            SELECT m.name, p.name
+            FROM sqlite_master m JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name != 'sqlite_sequence'
+            ORDER BY m.rowid, p.cid;
+        """)
+        columns_by_table = {}
+        for table, column in cursor.fetchall():
+            columns_by_table.setdefault(table, []).append(column)
+        for table, columns in columns_by_table.items():
+            _table_meta_cache[table] = _build_table_meta(table, columns)
+        
+        tables = list(columns_by_table)
         logger.info(f"📊 Found {len(tables)} tables in SQLite: {', '.join(tables)}")
         return tables
     except Exception as e:
@@ -59,186 +143,619 @@ def get_tables(sqlite_conn):
 def get_table_columns(sqlite_conn, table):
     """Get column names for a table"""
     try:
-        cursor = sqlite_conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table});")
-        columns = [row[1] for row in cursor.fetchall()]
-        return columns
+        return table_meta(sqlite_conn, table)[0]
     except Exception as e:
         logger.error(f"❌ Error getting columns for table {table}: {e}")
         return []
 
-def get_table_data(sqlite_conn, table):
-    """Get all data from a table"""
+def get_table_row_count(sqlite_conn, table, after_rowid=0):
+    """Get the number of rows in a table after the given rowid"""
     try:
         cursor = sqlite_conn.cursor()
-        columns = get_table_columns(sqlite_conn, table)
-        column_str = ", ".join(columns)
-        cursor.execute(f"SELECT {column_str} FROM {table};")
-        rows = cursor.fetchall()
-        logger.info(f"📊 Found {len(rows)} rows in table {table}")
-        return rows, columns
+        cursor.execute(f"SELECT COUNT(*) FROM {_quote_identifier(table)} WHERE rowid > ?;", (after_rowid,))
+        row_count = cursor.fetchone()[0]
+        logger.info(f"📊 Found {row_count} rows in table {table}")
+        return row_count
     except Exception as e:
-        logger.error(f"❌ Error getting data from table {table}: {e}")
-        return [], []
+        logger.error(f"❌ Error counting rows in table {table}: {e}")
+        return 0
+
+def iter_table_batches(sqlite_conn, table, after_rowid=0, batch_size=BATCH_SIZE):
+    """Yield a table's (rowid, *values) rows after after_rowid in lists of up to batch_size rows
+    
+    Only one batch is held in memory at a time, so tables of any size can be
+    migrated.
+    """
+    _, select_sql = table_meta(sqlite_conn, table)
+    cursor = sqlite_conn.cursor()
+    try:
+        cursor.execute(select_sql, (after_rowid,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
 
-def clear_postgres_table(session, table):
+_END_OF_BATCHES = object()
+
+def prefetch_batches(batches, maxsize=PREFETCH_BATCHES):
+    """Read batches from a generator on a background thread
+    
+    The SQLite read of the next batches overlaps with the PostgreSQL write of
+    the current one, since both drivers release the GIL during I/O. At most
+    maxsize batches wait in the queue. Closing this generator stops the
+    reader and closes batches.
+    """
+    batch_queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    
+    def read():
+        try:
+            for batch in batches:
+                if stop.is_set():
+                    return
+                batch_queue.put(batch)
+            batch_queue.put(_END_OF_BATCHES)
+        except Exception as e:
+            batch_queue.put(e)
+        finally:
+            batches.close()
+    
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = batch_queue.get()
+            if item is _END_OF_BATCHES:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Unblock a reader waiting on a full queue so it can see the stop flag
+        stop.set()
+        while reader.is_alive():
+            try:
+                batch_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+
+CREATE_MIGRATION_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS migration_state (
+    table_name TEXT PRIMARY KEY,
+    last_rowid BIGINT NOT NULL DEFAULT 0,
+    done BOOLEAN NOT NULL DEFAULT FALSE
+);
+"""
+
+SAVE_CHECKPOINT_SQL = text("""
+    INSERT INTO migration_state (table_name, last_rowid, done)
+    VALUES (:table_name, :last_rowid, :done)
+    ON CONFLICT (table_name) DO UPDATE
+    SET last_rowid = EXCLUDED.last_rowid, done = EXCLUDED.done;
+""")
+
+def create_migration_state_table(conn):
+    """Create the table recording how far each table's migration got"""
+    conn.execute(text(CREATE_MIGRATION_STATE_SQL))
+    conn.commit()
+
+def get_checkpoint(conn, table):
+    """Get (last migrated SQLite rowid, done) for a table"""
+    row = conn.execute(
+        text("SELECT last_rowid, done FROM migration_state WHERE table_name = :table_name;"),
+        {'table_name': table}
+    ).fetchone()
+    # Nothing to commit, but end the read so the load can begin its own transaction
+    conn.commit()
+    return tuple(row) if row else (0, False)
+
+def save_checkpoint(conn, table, last_rowid, done=False):
+    """Record a table's progress in the current transaction"""
+    conn.execute(SAVE_CHECKPOINT_SQL, {'table_name': table, 'last_rowid': last_rowid, 'done': done})
+
+def clear_checkpoints(conn):
+    """Forget every table's progress so the next run migrates everything again"""
+    conn.execute(text("DELETE FROM migration_state;"))
+    conn.commit()
+
+def finish_migration_state(conn):
+    """Drop migration_state once no table is left partially migrated
+    
+    Otherwise a later migration into the same database would skip every
+    table as already done. A table whose load failed part-way keeps its
+    checkpoint, and the table is kept so a rerun can resume it.
+    """
+    pending = conn.execute(text("SELECT table_name FROM migration_state WHERE NOT done;")).scalars().all()
+    if pending:
+        conn.commit()
+        logger.warning(f"⚠️ Tables left partially migrated, rerun to resume them: {', '.join(pending)}")
+        return False
+    conn.execute(text("DROP TABLE migration_state;"))
+    conn.commit()
+    logger.info("🗑️ Dropped migration_state, the migration is complete")
+    return True
+
+def clear_postgres_table(conn, table):
     """Clear data from PostgreSQL table"""
     try:
-        session.execute(text(f'TRUNCATE TABLE "{table}" CASCADE;'))
-        session.commit()
+        conn.execute(text(f'TRUNCATE TABLE "{table}" CASCADE;'))
+        conn.commit()
         logger.info(f"🗑️ Cleared data from PostgreSQL table: {table}")
         return True
     except Exception as e:
-        session.rollback()
+        conn.rollback()
         logger.error(f"❌ Error clearing PostgreSQL table {table}: {e}")
         return False
 
-def insert_data_to_postgres(session, table, rows, columns):
-    """Insert data from SQLite to PostgreSQL"""
-    if not rows:
-        logger.warning(f"⚠️ No data to insert for table {table}")
-        return 0
+def _copy_value(value):
+    """Render one SQLite value as a field in PostgreSQL's COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bytes):
+        # bytea hex input, with the backslash escaped for COPY
+        return '\\\\x' + value.hex()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+class _CopyStream(io.TextIOBase):
+    """File-like object that renders (rowid, *values) rows as COPY text lines as they are read
+    
+    copy_expert() pulls fixed-size chunks from it, so the whole table is
+    never held as one big string. The rowid isn't copied, only remembered.
+    """
+    def __init__(self, rows):
+        self._lines = self._render(rows)
+        self._buffer = ''
+        self.row_count = 0
+        self.last_rowid = None
     
+    def _render(self, rows):
+        for row in rows:
+            self.row_count += 1
+            self.last_rowid = row[0]
+            yield '\t'.join(map(_copy_value, row[1:])) + '\n'
+    
+    def readable(self):
+        return True
+    
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size is None or size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        
+        data = ''.join(parts)
+        if size is None or size < 0 or len(data) <= size:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+def copy_data_to_postgres(conn, table, batches, columns, after_rowid=0):
+    """Stream batches of (rowid, *values) rows into PostgreSQL with COPY FROM STDIN
+    
+    Every CHECKPOINT_BATCHES batches are copied in one transaction that also
+    saves the table's checkpoint, so an interrupted run loses at most one
+    segment of work.
+    """
+    column_str = ", ".join([f'"{col}"' for col in columns])
+    copy_sql = f'COPY "{table}" ({column_str}) FROM STDIN'
+    batches = iter(batches)
+    copied_count = 0
+    last_rowid = after_rowid
+    
+    for first_batch in batches:
+        segment = chain((first_batch,), islice(batches, CHECKPOINT_BATCHES - 1))
+        stream = _CopyStream(chain.from_iterable(segment))
+        
+        # copy_expert() is psycopg2-specific, so go through the raw DBAPI
+        # connection; begin() first so the COPY runs in a transaction
+        # SQLAlchemy knows to commit
+        with conn.begin():
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(copy_sql, stream)
+            finally:
+                cursor.close()
+            last_rowid = stream.last_rowid
+            save_checkpoint(conn, table, last_rowid)
+        copied_count += stream.row_count
+    
+    with conn.begin():
+        save_checkpoint(conn, table, last_rowid, done=True)
+    
+    logger.info(f"✅ Copied {copied_count} rows into {table}")
+    return copied_count
+
+def _fixup_user_rows(params):
+    """Ensure password hashes are stored as strings"""
+    for row_dict in params:
+        value = row_dict.get('password_hash')
+        if value is not None:
+            row_dict['password_hash'] = str(value)
+
+# Per-table passes over each batch of INSERT parameters
+_ROW_FIXUPS = {'user': _fixup_user_rows}
+
+def _insert_rows_one_by_one(conn, table, insert_stmt, params):
+    """Insert a failed batch row by row, logging and skipping the bad rows"""
+    inserted_count = 0
+    for row_dict in params:
+        try:
+            with conn.begin_nested():
+                conn.execute(insert_stmt, row_dict)
+            inserted_count += 1
+        except DBAPIError as e:
+            logger.error(f"❌ Error inserting row into {table}: {e}")
+            logger.error(f"Problematic row: {row_dict}")
+    return inserted_count
+
+def insert_data_to_postgres(conn, table, batches, columns, total_rows, after_rowid=0):
+    """Insert batches of (rowid, *values) rows from SQLite into PostgreSQL
+    
+    Each batch runs inside a SAVEPOINT, so a bad row only rolls back its own
+    batch, which is then retried row by row to skip just the bad rows. The
+    work is committed with a checkpoint every CHECKPOINT_BATCHES batches.
+    """
     try:
         success_count = 0
-        total_rows = len(rows)
+        last_rowid = after_rowid
         
-        # PostgreSQL doesn't support SQLite's rowid, so we need to handle it specially
-        # Also, some tables might need special handling for data types
-        for row in rows:
+        # Built once per table and reused for every batch
+        placeholders = ", ".join([f":{col}" for col in columns])
+        column_str = ", ".join([f'"{col}"' for col in columns])
+        insert_stmt = text(f'INSERT INTO "{table}" ({column_str}) VALUES ({placeholders})')
+        
+        # Some tables need special handling for data types
+        fixup = _ROW_FIXUPS.get(table)
+        log_progress = total_rows > BATCH_SIZE and logger.isEnabledFor(logging.INFO)
+        last_log = time.monotonic()
+        
+        for batch_number, chunk in enumerate(batches, 1):
+            params = [dict(zip(columns, row[1:])) for row in chunk]
+            if fixup:
+                fixup(params)
+            
             try:
-                # Convert SQLite row to dict
-                row_dict = {columns[i]: row[i] for i in range(len(columns))}
-                
-                # Special processing for certain columns/tables
-                if table == 'user' and 'password_hash' in row_dict:
-                    # Ensure password hash is stored as string
-                    if row_dict['password_hash'] is not None:
-                        row_dict['password_hash'] = str(row_dict['password_hash'])
-                
-                # Build placeholders for SQL
-                placeholders = ", ".join([f":{col}" for col in columns])
-                column_str = ", ".join([f'"{col}"' for col in columns])
-                
-                # Insert data
-                session.execute(
-                    text(f'INSERT INTO "{table}" ({column_str}) VALUES ({placeholders})'),
-                    row_dict
-                )
-                
-                # Commit in batches
-                if success_count % 100 == 0:
-                    session.commit()
-                
-                success_count += 1
-                
-                # Show progress for large tables
-                if total_rows > 100 and success_count % 100 == 0:
-                    logger.info(f"⏳ Inserted {success_count}/{total_rows} rows into {table} ({(success_count/total_rows)*100:.1f}%)")
+                with conn.begin_nested():
+                    conn.execute(insert_stmt, params)
+                success_count += len(params)
+            except DBAPIError as e:
+                logger.warning(f"⚠️ Batch of {len(params)} rows into {table} failed, retrying row by row: {e}")
+                success_count += _insert_rows_one_by_one(conn, table, insert_stmt, params)
+            
+            last_rowid = chunk[-1][0]
+            if batch_number % CHECKPOINT_BATCHES == 0:
+                save_checkpoint(conn, table, last_rowid)
+                conn.commit()
             
-            except Exception as e:
-                session.rollback()
-                logger.error(f"❌ Error inserting row into {table}: {e}")
-                logger.error(f"Problematic row: {row_dict}")
+            # Show progress for large tables, at most once per interval
+            if log_progress and time.monotonic() - last_log >= PROGRESS_LOG_INTERVAL:
+                last_log = time.monotonic()
+                logger.info(f"⏳ Inserted {success_count}/{total_rows} rows into {table} ({(success_count/total_rows)*100:.1f}%)")
         
-        # Final commit
-        session.commit()
+        save_checkpoint(conn, table, last_rowid, done=True)
+        conn.commit()
         
         logger.info(f"✅ Inserted {success_count}/{total_rows} rows into {table}")
         return success_count
     
     except Exception as e:
-        session.rollback()
+        conn.rollback()
         logger.error(f"❌ Error inserting data into {table}: {e}")
         return 0
 
-def migrate_table(sqlite_conn, pg_session, table):
+def migrate_table(sqlite_conn, pg_conn, table):
     """Migrate a single table from SQLite to PostgreSQL"""
     logger.info(f"\n=== Migrating table: {table} ===")
     
-    # Get data from SQLite
-    rows, columns = get_table_data(sqlite_conn, table)
-    if not rows:
+    # Resume after the last checkpoint a previous run committed
+    after_rowid, done = get_checkpoint(pg_conn, table)
+    if done:
+        logger.info(f"⏭️ Table {table} was already migrated, skipping")
+        return 0
+    if after_rowid:
+        logger.info(f"⏳ Resuming table {table} after rowid {after_rowid}")
+    
+    # Count the rows first; the data itself is streamed in batches
+    total_rows = get_table_row_count(sqlite_conn, table, after_rowid)
+    if not total_rows:
         logger.warning(f"⚠️ No data to migrate for table {table}")
         return 0
+    columns = get_table_columns(sqlite_conn, table)
     
     # Clear PostgreSQL table (optional - be careful!)
-    # clear_postgres_table(pg_session, table)
+    # clear_postgres_table(pg_conn, table)
     
-    # Insert data into PostgreSQL
-    inserted_count = insert_data_to_postgres(pg_session, table, rows, columns)
+    # COPY the whole table in one go; if PostgreSQL rejects any row, fall
+    # back to batched INSERTs so the bad rows can be found and skipped
+    try:
+        with closing(prefetch_batches(iter_table_batches(sqlite_conn, table, after_rowid))) as batches:
+            inserted_count = copy_data_to_postgres(pg_conn, table, batches, columns, after_rowid)
+    except Exception as e:
+        pg_conn.rollback()
+        logger.warning(f"⚠️ COPY into {table} failed, falling back to batched INSERTs: {e}")
+        # Re-read the table from the last segment the COPY committed
+        after_rowid, _ = get_checkpoint(pg_conn, table)
+        total_rows = get_table_row_count(sqlite_conn, table, after_rowid)
+        with closing(prefetch_batches(iter_table_batches(sqlite_conn, table, after_rowid))) as batches:
+            inserted_count = insert_data_to_postgres(pg_conn, table, batches, columns, total_rows, after_rowid)
     
     return inserted_count
 
+# Definitions of the indexes and foreign keys dropped for the load, committed
+# before they are dropped and deleted once restored, so a crashed run can't
+# lose them
+CREATE_DROPPED_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS migration_dropped_schema (
+    kind TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    PRIMARY KEY (kind, table_name, name)
+);
+"""
+
+SAVE_DROPPED_SCHEMA_SQL = text("""
+    INSERT INTO migration_dropped_schema (kind, table_name, name, definition)
+    VALUES (:kind, :table_name, :name, :definition)
+    ON CONFLICT DO NOTHING;
+""")
+
+DELETE_DROPPED_SCHEMA_SQL = text("""
+    DELETE FROM migration_dropped_schema
+    WHERE kind = :kind AND table_name = :table_name AND name = :name;
+""")
+
+def create_dropped_schema_table(conn):
+    """Create the table holding the definitions of dropped indexes and foreign keys"""
+    conn.execute(text(CREATE_DROPPED_SCHEMA_SQL))
+    conn.commit()
+
+def get_dropped_schema(conn, kind):
+    """Get (table, name, definition) for every dropped object of a kind"""
+    rows = conn.execute(
+        text("SELECT table_name, name, definition FROM migration_dropped_schema WHERE kind = :kind;"),
+        {'kind': kind}
+    ).fetchall()
+    conn.commit()
+    return [tuple(row) for row in rows]
+
+def save_dropped_schema(conn, kind, rows):
+    """Record (table, name, definition) rows before the objects are dropped"""
+    conn.execute(SAVE_DROPPED_SCHEMA_SQL, [
+        {'kind': kind, 'table_name': table_name, 'name': name, 'definition': definition}
+        for table_name, name, definition in rows
+    ])
+    conn.commit()
+
+def finish_dropped_schema(conn):
+    """Drop migration_dropped_schema once everything in it has been restored"""
+    if conn.execute(text("SELECT EXISTS (SELECT 1 FROM migration_dropped_schema);")).scalar():
+        conn.commit()
+        logger.warning("⚠️ Some dropped indexes or foreign keys could not be restored, "
+                       "see migration_dropped_schema; a rerun retries them")
+        return False
+    conn.execute(text("DROP TABLE migration_dropped_schema;"))
+    conn.commit()
+    return True
+
+def drop_secondary_indexes(conn, tables):
+    """Drop the indexes on tables that no constraint depends on
+    
+    Their CREATE INDEX statements are saved to migration_dropped_schema
+    first, so recreate_indexes() can build them once after the load instead
+    of updating them row by row, even if this run crashes.
+    Primary key, unique and exclusion constraint indexes are kept.
+    """
+    result = conn.execute(text("""
+        SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = 'public'
+          AND t.relname = ANY(:tables)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid);
+    """), {'tables': list(tables)}).fetchall()
+    conn.commit()
+    
+    if result:
+        save_dropped_schema(conn, 'index', result)
+        conn.execute(text(f"DROP INDEX {', '.join(name for _, name, _ in result)};"))
+        conn.commit()
+    
+    logger.info(f"🗑️ Dropped {len(result)} secondary indexes until the load finishes")
+    return len(result)
+
+def recreate_indexes(conn):
+    """Rebuild the indexes saved in migration_dropped_schema, one transaction each
+    
+    An index's entry is deleted in the transaction that rebuilds it, or
+    right away if the index already exists; a failed rebuild keeps it.
+    """
+    index_ddl = get_dropped_schema(conn, 'index')
+    if not index_ddl:
+        return
+    
+    recreated = 0
+    for table_name, index_name, ddl in index_ddl:
+        key = {'kind': 'index', 'table_name': table_name, 'name': index_name}
+        try:
+            if conn.execute(text("SELECT to_regclass(:name) IS NULL;"), {'name': index_name}).scalar():
+                conn.execute(text(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}';"))
+                conn.execute(text(ddl))
+            conn.execute(DELETE_DROPPED_SCHEMA_SQL, key)
+            conn.commit()
+            recreated += 1
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error recreating index, run it manually: {ddl}: {e}")
+    
+    logger.info(f"✅ Recreated {recreated}/{len(index_ddl)} indexes")
+
+def drop_foreign_keys(conn, tables):
+    """Drop the foreign keys declared on tables
+    
+    Their (table, constraint name, definition) rows are saved to
+    migration_dropped_schema first, so restore_foreign_keys() can check
+    them once against the loaded data instead of once per inserted row,
+    even if this run crashes.
+    """
+    # A key left NOT VALID by an earlier run is saved without the suffix,
+    # which restore_foreign_keys() adds itself
+    result = conn.execute(text("""
+        SELECT c.conrelid::regclass::text, quote_ident(c.conname),
+               regexp_replace(pg_get_constraintdef(c.oid), ' NOT VALID$', '')
+        FROM pg_constraint c
+        JOIN pg_class t ON t.oid = c.conrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE c.contype = 'f'
+          AND n.nspname = 'public'
+          AND t.relname = ANY(:tables);
+    """), {'tables': list(tables)}).fetchall()
+    conn.commit()
+    
+    if result:
+        save_dropped_schema(conn, 'foreign_key', result)
+        for table_name, constraint_name, _ in result:
+            conn.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {constraint_name};"))
+        conn.commit()
+    
+    logger.info(f"🗑️ Dropped {len(result)} foreign keys until the load finishes")
+    return len(result)
+
+def restore_foreign_keys(conn):
+    """Re-add the foreign keys saved in migration_dropped_schema and validate them
+    
+    Each key is added NOT VALID, which is instant and enforces it for new
+    rows, then validated against the existing rows in one pass. A key's
+    entry is deleted once it validates. A key the migrated data violates is
+    logged, left NOT VALID and keeps its entry.
+    """
+    foreign_keys = get_dropped_schema(conn, 'foreign_key')
+    if not foreign_keys:
+        return
+    
+    restored = 0
+    for table_name, constraint_name, definition in foreign_keys:
+        try:
+            exists = conn.execute(text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = to_regclass(:table_name) AND quote_ident(conname) = :constraint_name
+                );
+            """), {'table_name': table_name, 'constraint_name': constraint_name}).scalar()
+            if not exists:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD CONSTRAINT {constraint_name} {definition} NOT VALID;"))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error restoring foreign key {constraint_name} on {table_name}, "
+                         f"add it manually: {definition}: {e}")
+            continue
+        
+        try:
+            conn.execute(text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint_name};"))
+            conn.execute(DELETE_DROPPED_SCHEMA_SQL, {
+                'kind': 'foreign_key', 'table_name': table_name, 'name': constraint_name
+            })
+            conn.commit()
+            restored += 1
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Foreign key {constraint_name} on {table_name} does not hold for the "
+                         f"migrated data and was left NOT VALID: {e}")
+    
+    logger.info(f"✅ Restored {restored}/{len(foreign_keys)} foreign keys")
+
+def _disable_synchronous_commit(dbapi_connection, connection_record):
+    # Commits don't wait for the WAL flush; a server crash can only lose the
+    # last few commits, and each one carries its own checkpoint, so a rerun
+    # resumes from whatever actually persisted
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET synchronous_commit = off")
+    cursor.close()
+
+def _init_worker():
+    """Drop pooled PostgreSQL connections inherited from the parent process"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+        event.listen(db.engine, 'connect', _disable_synchronous_commit)
+
+def _migrate_table_worker(sqlite_path, table):
+    """Migrate one table in a worker process using its own connections"""
+    sqlite_conn = create_sqlite_connection(sqlite_path)
+    try:
+        with app.app_context(), db.engine.connect() as pg_conn:
+            return migrate_table(sqlite_conn, pg_conn, table)
+    finally:
+        sqlite_conn.close()
+
 def backup_sqlite_database(sqlite_path):
     """Create a backup of the SQLite database"""
     try:
         backup_path = f"{sqlite_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        import shutil
-        shutil.copy2(sqlite_path, backup_path)
+        # SQLite's online backup copies a consistent snapshot even if the app
+        # is writing to the database; read-only so a missing file isn't created
+        source_uri = Path(sqlite_path).absolute().as_uri() + '?mode=ro'
+        with closing(sqlite3.connect(source_uri, uri=True)) as source, \
+                closing(sqlite3.connect(backup_path)) as destination:
+            source.backup(destination, pages=1024)
         logger.info(f"✅ Created backup of SQLite database: {backup_path}")
         return backup_path
     except Exception as e:
         logger.error(f"❌ Error creating backup of SQLite database: {e}")
         return None
 
-def reset_sequences(pg_session):
+# Moves every public table's id sequence past the table's current MAX(id),
+# server-side in one round-trip; an empty table's next id is 1
+RESET_SEQUENCES_SQL = """
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT c.table_name, pg_get_serial_sequence(quote_ident(c.table_name), 'id') AS seq
+        FROM information_schema.columns c
+        JOIN pg_tables t ON t.schemaname = c.table_schema AND t.tablename = c.table_name
+        WHERE c.table_schema = 'public' AND c.column_name = 'id'
+    LOOP
+        IF r.seq IS NOT NULL THEN
+            EXECUTE format('SELECT setval(%L, COALESCE(MAX(id), 0) + 1, false) FROM %I',
+                           r.seq, r.table_name);
+        END IF;
+    END LOOP;
+END $$;
+"""
+
+def reset_sequences(pg_conn):
     """Reset sequence counters in PostgreSQL based on max ID values"""
     try:
-        # Get a list of all tables
-        result = pg_session.execute(text("""
-            SELECT tablename FROM pg_tables WHERE schemaname = 'public';
-        """)).fetchall()
-        
-        tables = [row[0] for row in result]
-        
-        for table in tables:
-            try:
-                # Check if table has an id column
-                result = pg_session.execute(text(f"""
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = '{table}' AND column_name = 'id';
-                """)).fetchone()
-                
-                if result:
-                    # Get the sequence name
-                    result = pg_session.execute(text(f"""
-                        SELECT pg_get_serial_sequence('{table}', 'id');
-                    """)).fetchone()
-                    
-                    if result and result[0]:
-                        sequence_name = result[0]
-                        
-                        # Get max id
-                        result = pg_session.execute(text(f"""
-                            SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}";
-                        """)).fetchone()
-                        
-                        if result:
-                            max_id = result[0]
-                            
-                            # Set sequence value
-                            pg_session.execute(text(f"""
-                                ALTER SEQUENCE {sequence_name} RESTART WITH {max_id};
-                            """))
-                            
-                            logger.info(f"✅ Reset sequence for {table} to {max_id}")
-            
-            except Exception as e:
-                logger.warning(f"⚠️ Could not reset sequence for {table}: {e}")
-        
-        pg_session.commit()
+        pg_conn.execute(text(RESET_SEQUENCES_SQL))
+        pg_conn.commit()
         logger.info("✅ Reset all sequences")
         return True
     
     except Exception as e:
-        pg_session.rollback()
+        pg_conn.rollback()
         logger.error(f"❌ Error resetting sequences: {e}")
         return False
 
 def main():
     """Main migration function"""
+    parser = argparse.ArgumentParser(description="Migrate data from SQLite to PostgreSQL")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the checkpoints of an interrupted run and migrate every table again")
+    args = parser.parse_args()
+    
     logger.info("=== SQLite to PostgreSQL Migration ===")
     
     # Check if PostgreSQL URL is set
@@ -248,6 +765,10 @@ def main():
     print("\n⚠️ WARNING: This will migrate data from SQLite to PostgreSQL.")
     print("Existing data in PostgreSQL will NOT be deleted unless you uncomment the clear_postgres_table calls.")
     print("It's recommended to run this on a fresh PostgreSQL database.")
+    if args.restart:
+        print("--restart: checkpoints of a previous run are discarded and every table is migrated again.")
+    else:
+        print("If a previous run was interrupted, each table resumes after its last checkpoint.")
     
     confirmation = input("\nDo you want to continue? (yes/no): ")
     if confirmation.lower() != 'yes':
@@ -268,11 +789,12 @@ def main():
     # Connect to SQLite
     sqlite_conn = create_sqlite_connection(sqlite_path)
     
-    # Create PostgreSQL session
+    # Connect to PostgreSQL; the migration only runs Core statements, so it
+    # uses a plain Connection rather than the ORM session
     try:
-        with app.app_context():
+        with app.app_context(), db.engine.connect() as pg_conn:
             # Check PostgreSQL connection
-            db.session.execute(text('SELECT 1')).scalar()
+            pg_conn.execute(text('SELECT 1')).scalar()
             logger.info("✅ Connected to PostgreSQL database")
             
             # Get tables from SQLite
@@ -282,12 +804,39 @@ def main():
             start_time = time.time()
             total_rows_migrated = 0
             
-            for table in tables:
-                rows_migrated = migrate_table(sqlite_conn, db.session, table)
-                total_rows_migrated += rows_migrated
+            create_migration_state_table(pg_conn)
+            create_dropped_schema_table(pg_conn)
+            
+            # Restore anything a crashed run dropped before dropping it again
+            recreate_indexes(pg_conn)
+            restore_foreign_keys(pg_conn)
+            
+            if args.restart:
+                clear_checkpoints(pg_conn)
+                logger.info("🗑️ Cleared the checkpoints of previous runs")
+            
+            # Secondary indexes and foreign keys are restored once at the end,
+            # even if the load fails. With no foreign keys to satisfy while
+            # loading, every table can be migrated in parallel.
+            drop_secondary_indexes(pg_conn, tables)
+            try:
+                drop_foreign_keys(pg_conn, tables)
+                with ProcessPoolExecutor(max_workers=MIGRATION_WORKERS, initializer=_init_worker) as executor:
+                    logger.info(f"📊 Migrating {len(tables)} tables with {MIGRATION_WORKERS} workers")
+                    futures = [executor.submit(_migrate_table_worker, sqlite_path, table) for table in tables]
+                    for future in as_completed(futures):
+                        total_rows_migrated += future.result()
+            finally:
+                # Clear any failed transaction before running the restore DDL
+                pg_conn.rollback()
+                recreate_indexes(pg_conn)
+                restore_foreign_keys(pg_conn)
             
             # Reset sequences
-            reset_sequences(db.session)
+            reset_sequences(pg_conn)
+            
+            finish_migration_state(pg_conn)
+            finish_dropped_schema(pg_conn)
             
             end_time = time.time()
             duration = end_time - start_time
@@ -0,0 +1,160 @@
+"""
+Idempotent schema migrations run on one connection in a single transaction
+
+Usage: python migrations.py [migration_name ...]
+
+With no arguments every migration is applied. Each statement uses
+IF NOT EXISTS (or an equivalent guard), so the whole set can be re-run safely.
+"""
+import os
+import sys
+import logging
+import psycopg2
+from db_seed import copy_seed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Default settings seeded when the system_setting table is empty
+DEFAULT_SETTINGS = [
+    {
+        'key': 'app.name',
+        'value': 'JESA Engineering Estimation Tool',
+        'type': 'string',
+        'description': 'Application name displayed in various parts of the UI'
+    },
+    {
+        'key': 'app.footer_text',
+        'value': '© 2025 JESA Group. All rights reserved.',
+        'type': 'string',
+        'description': 'Text displayed in the application footer'
+    },
+    {
+        'key': 'app.default_timezone',
+        'value': 'UTC',
+        'type': 'string',
+        'description': 'Default timezone for date/time display'
+    },
+    {
+        'key': 'project.auto_archive_days',
+        'value': '90',
+        'type': 'int',
+        'description': 'Number of days after which completed projects are auto-archived'
+    },
+    {
+        'key': 'notifications.max_age_days',
+        'value': '30',
+        'type': 'int',
+        'description': 'Maximum age in days for notifications before they are automatically deleted'
+    }
+]
+
+ADD_CUSTOM_PHASE_COLUMN_SQL = """
+ALTER TABLE project
+ADD COLUMN IF NOT EXISTS custom_phase VARCHAR(100);
+"""
+
+ADD_LAST_MODIFIED_COLUMN_SQL = """
+ALTER TABLE deliverable_upload
+ADD COLUMN IF NOT EXISTS last_modified TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW();
+"""
+
+ADD_USER_ACTIVE_COLUMN_SQL = """
+ALTER TABLE "user"
+ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+"""
+
+CREATE_SYSTEM_SETTING_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS system_setting (
+    id SERIAL PRIMARY KEY,
+    setting_key VARCHAR(100) NOT NULL UNIQUE,
+    setting_value TEXT,
+    setting_type VARCHAR(50) DEFAULT 'string',
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+def seed_system_settings(cursor):
+    """
+    COPY the default settings into system_setting if it has no settings yet
+
+    Matches the old behaviour of seeding right after the table is first
+    created. COPY can't be part of a multi-statement message, so this runs
+    after the DDL batch, on the same cursor and in the same transaction.
+    """
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM system_setting);")
+    if cursor.fetchone()[0]:
+        return
+    copy_seed(
+        cursor,
+        'system_setting',
+        ['setting_key', 'setting_value', 'setting_type', 'description'],
+        [(s['key'], s['value'], s['type'], s['description']) for s in DEFAULT_SETTINGS]
+    )
+
+# Ordered (name, sql) steps; names match the scripts that wrap them
+MIGRATIONS = [
+    ('add_custom_phase_column', ADD_CUSTOM_PHASE_COLUMN_SQL),
+    ('add_last_modified_column', ADD_LAST_MODIFIED_COLUMN_SQL),
+    ('add_user_active_column', ADD_USER_ACTIVE_COLUMN_SQL),
+    ('add_system_settings_table', CREATE_SYSTEM_SETTING_TABLE_SQL),
+]
+
+# Data loads that run after the DDL batch when their step is selected
+SEEDS = {
+    'add_system_settings_table': seed_system_settings,
+}
+
+def run_migrations(names=None):
+    """
+    Apply the named migrations (all of them by default) in one transaction
+
+    All selected statements are sent to the server as a single message, then
+    any seeds for the selected steps are COPYed in, and everything is
+    committed once, so a failure in any step leaves the schema unchanged.
+    """
+    known = [name for name, _ in MIGRATIONS]
+    unknown = set(names or []) - set(known)
+    if unknown:
+        logger.error(f"Unknown migrations: {', '.join(sorted(unknown))}")
+        return False
+
+    steps = [step for step in MIGRATIONS if not names or step[0] in names]
+
+    db_url = os.environ.get("DATABASE_URL")
+    if not db_url:
+        logger.error("DATABASE_URL environment variable not set")
+        return False
+
+    query = "".join(step_sql for _, step_sql in steps)
+
+    conn = psycopg2.connect(db_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            for name, _ in steps:
+                if name in SEEDS:
+                    SEEDS[name](cursor)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Migration failed, no changes applied: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+    for name, _ in steps:
+        logger.info(f"Applied {name}")
+    return True
+
+if __name__ == "__main__":
+    logger.info("Starting schema migrations")
+
+    if run_migrations(sys.argv[1:]):
+        logger.info("Migration completed successfully")
+    else:
+        logger.error("Migration failed")
+        sys.exit(1)
@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
+from flask import g, has_request_context
 from flask_login import UserMixin
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
 import json
@@ -8,6 +11,24 @@ from time import time
 import jwt
 import os
 
+# Roles with access to every discipline's hours
+_FULL_ACCESS_ROLES = frozenset({'E&D'})
+
+# Estimate form hour fields -> the discipline that owns them
+_DISCIPLINE_FIELD_MAP = {
+    'process_sid_hours': 'process_sid',
+    'civil_structure_hours': 'civil_structure',
+    'piping_hours': 'piping',
+    'mechanical_hours': 'mechanical',
+    'electrical_hours': 'electrical',
+    'instrumentation_control_hours': 'instrumentation_control',
+    'digitalization_hours': 'digitalization',
+    'engineering_management_hours': 'engineering_management',
+    'environmental_hours': 'environmental',
+    'tools_admin_hours': 'tools_admin',
+    'construction_hours': 'construction',
+}
+
 # User model for authentication and authorization
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -40,8 +61,13 @@ class User(UserMixin, db.Model):
         """Check if user is part of the E&D team or is a HOD"""
         return self.role == 'E&D' or self.role == 'HOD'
     
+    @staticmethod
+    def hash_password(password):
+        """Hash a password without needing a User instance (e.g. for bulk inserts)"""
+        return generate_password_hash(password)
+    
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = User.hash_password(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -74,39 +100,14 @@ class User(UserMixin, db.Model):
         return User.query.get(user_id)
     
     def has_discipline_access(self, discipline_field):
-        # Admins have access to all disciplines
-        if self.is_admin:
+        # Admins and full-access roles have access to all disciplines
+        if self.is_admin or self.role in _FULL_ACCESS_ROLES:
             return True
         
-        # E&D role has access to all disciplines
-        if self.role == 'E&D':
-            return True
-        
-        # Engineering management can have multiple users
-        if discipline_field == 'engineering_management_hours' and self.discipline == 'engineering_management':
-            return True
-        
-        # Mapping form fields to discipline names
-        discipline_map = {
-            'process_sid_hours': 'process_sid',
-            'civil_structure_hours': 'civil_structure',
-            'piping_hours': 'piping',
-            'mechanical_hours': 'mechanical',
-            'electrical_hours': 'electrical',
-            'instrumentation_control_hours': 'instrumentation_control',
-            'digitalization_hours': 'digitalization',
-            'engineering_management_hours': 'engineering_management',
-            'environmental_hours': 'environmental',
-            'tools_admin_hours': 'tools_admin',
-            'construction_hours': 'construction',
-        }
-        
-        # HODs can only access their specific discipline
-        if discipline_field in discipline_map:
-            if self.discipline == discipline_map[discipline_field]:
-                return True
-        
-        return False
+        # HODs can only access their specific discipline (engineering
+        # management can have multiple users, all matched the same way)
+        discipline = _DISCIPLINE_FIELD_MAP.get(discipline_field)
+        return discipline is not None and self.discipline == discipline
 
 # Project model for storing project information and estimates
 class Project(db.Model):
@@ -201,20 +202,12 @@ class Project(db.Model):
     
     def get_hourly_rate(self):
         """Get the current hourly rate from the latest historical rate"""
-        latest_rate = HistoricalRate.query.order_by(HistoricalRate.effective_date.desc()).first()
-        return latest_rate.rate if latest_rate else 500  # Default to 500 DH if no rate is set
+        rate = _get_current_rate()
+        return rate if rate is not None else 500  # Default to 500 DH if no rate is set
     
     def calculate_estimated_cost(self):
         """Calculate total estimated cost based on hours and rate"""
-        total_hours = sum([
-            self.process_sid_hours, self.civil_structure_hours,
-            self.piping_hours, self.mechanical_hours,
-            self.electrical_hours, self.instrumentation_control_hours,
-            self.digitalization_hours, self.engineering_management_hours,
-            self.environmental_hours, self.tools_admin_hours,
-            self.construction_hours
-        ])
-        return total_hours * self.get_hourly_rate()
+        return self.get_total_hours() * self.get_hourly_rate()
     
     def get_phase_ratio(self):
         """Get ratio based on project phase"""
@@ -378,14 +371,16 @@ class Project(db.Model):
         if not self.planned_start_date or not self.planned_end_date:
             return self.progress_percentage
         
-        if datetime.utcnow() < self.planned_start_date:
+        now = datetime.utcnow()
+        
+        if now < self.planned_start_date:
             return 0
         
-        if datetime.utcnow() > self.planned_end_date:
+        if now > self.planned_end_date:
             return 100
         
         total_days = (self.planned_end_date - self.planned_start_date).days
-        days_passed = (datetime.utcnow() - self.planned_start_date).days
+        days_passed = (now - self.planned_start_date).days
         
         if total_days <= 0:
             return 0
@@ -411,6 +406,36 @@ class Project(db.Model):
         else:
             return self.progress_percentage
     
+    @classmethod
+    def sync_status_based_progress(cls):
+        """Recompute progress from status for all projects in one UPDATE
+        
+        Mirrors calculate_status_based_progress() as a SQL CASE so the rows
+        never have to be loaded into Python. Returns the number of rows changed.
+        """
+        new_progress = db.case(
+            (cls.status == 'Completed', 100),
+            (cls.status == 'Submitted', 75),
+            (cls.status == 'Approved', 50),
+            (cls.status == 'Pending Validation', 30),
+            (db.and_(cls.status == 'Draft', cls.estimate_submitted.is_(True)), 25),
+            (cls.status == 'Draft', 10),
+            (cls.status == 'Rejected', 15),
+        )
+        
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.status.in_(['Completed', 'Submitted', 'Approved',
+                                   'Pending Validation', 'Draft', 'Rejected']))
+            # Small threshold to avoid floating point issues
+            .where(db.or_(cls.progress_percentage.is_(None),
+                          db.func.abs(cls.progress_percentage - new_progress) > 0.1))
+            .values(progress_percentage=new_progress)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+    
     def get_hour_distribution(self):
         """Get hours distribution across disciplines"""
         return {
@@ -429,7 +454,12 @@ class Project(db.Model):
     
     def get_total_hours(self):
         """Calculate total estimated hours"""
-        return sum(self.get_hour_distribution().values())
+        return (self.process_sid_hours + self.civil_structure_hours +
+                self.piping_hours + self.mechanical_hours +
+                self.electrical_hours + self.instrumentation_control_hours +
+                self.digitalization_hours + self.engineering_management_hours +
+                self.environmental_hours + self.tools_admin_hours +
+                self.construction_hours)
     
     def calculate_reference_hours(self):
         """Calculate reference hours based on TIC value and project phase"""
@@ -676,6 +706,41 @@ class HistoricalRate(db.Model):
     
     user = db.relationship('User')
 
+# Outside a request the latest rate is reused for up to this many seconds
+RATE_CACHE_SECONDS = 60
+
+def _query_current_rate():
+    """Rate of the most recent HistoricalRate, or None if no rate is set"""
+    return (db.session.query(HistoricalRate.rate)
+            .order_by(HistoricalRate.effective_date.desc())
+            .limit(1)
+            .scalar())
+
+@lru_cache(maxsize=1)
+def _cached_current_rate(ttl_bucket):
+    return _query_current_rate()
+
+def _get_current_rate():
+    """Latest hourly rate, queried at most once per request
+    
+    Project lists cost every project with the same rate, so it is kept on
+    flask.g for the request; CLI and other non-request code reuse it for up
+    to RATE_CACHE_SECONDS.
+    """
+    if has_request_context():
+        if '_current_hourly_rate' not in g:
+            g._current_hourly_rate = _query_current_rate()
+        return g._current_hourly_rate
+    return _cached_current_rate(int(time() // RATE_CACHE_SECONDS))
+
+@event.listens_for(HistoricalRate, 'after_insert')
+@event.listens_for(HistoricalRate, 'after_update')
+@event.listens_for(HistoricalRate, 'after_delete')
+def _invalidate_current_rate(mapper, connection, target):
+    _cached_current_rate.cache_clear()
+    if has_request_context():
+        g.pop('_current_hourly_rate', None)
+
 # Notifications for users
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -53,41 +53,55 @@ def execute_sql(sql, params=None, fetch=False):
         if conn:
             conn.close()
 
+# Snapshot of the public schema, loaded once by load_schema_cache() so each
+# existence check is a set lookup instead of an information_schema query
+_columns = {}  # (table_name, column_name) -> is_nullable ('YES'/'NO')
+_tables = set()
+
+def load_schema_cache():
+    """Load every public table/column from information_schema in one query"""
+    rows = execute_sql(
+        "SELECT table_name, column_name, is_nullable FROM information_schema.columns WHERE table_schema = 'public'",
+        fetch=True
+    )
+    if rows is None:
+        return False
+    
+    _columns.clear()
+    _columns.update({(table, column): nullable for table, column, nullable in rows})
+    _tables.clear()
+    _tables.update(table for table, _, _ in rows)
+    return True
+
+def column_exists(table, column):
+    return (table, column) in _columns
+
+def column_is_nullable(table, column):
+    return _columns.get((table, column)) == 'YES'
+
+def table_exists(table):
+    return table in _tables
+
 def update_deliverable_upload_table():
     """Add phase and version columns to deliverable_upload table"""
     print("Modifying deliverable_upload table...")
     
     # Check if phase column exists
-    phase_exists = execute_sql(
-        "SELECT column_name FROM information_schema.columns WHERE table_name = 'deliverable_upload' AND column_name = 'phase'",
-        fetch=True
-    )
-    
-    if not phase_exists:
+    if not column_exists('deliverable_upload', 'phase'):
         execute_sql("ALTER TABLE deliverable_upload ADD COLUMN phase VARCHAR(100) DEFAULT 'Define'")
         print("Added phase column")
     else:
         print("Phase column already exists")
     
     # Check if version column exists
-    version_exists = execute_sql(
-        "SELECT column_name FROM information_schema.columns WHERE table_name = 'deliverable_upload' AND column_name = 'version'",
-        fetch=True
-    )
-    
-    if not version_exists:
+    if not column_exists('deliverable_upload', 'version'):
         execute_sql("ALTER TABLE deliverable_upload ADD COLUMN version INTEGER DEFAULT 1")
         print("Added version column")
     else:
         print("Version column already exists")
     
     # Make project_id not nullable if it is
-    project_id_nullable = execute_sql(
-        "SELECT is_nullable FROM information_schema.columns WHERE table_name = 'deliverable_upload' AND column_name = 'project_id'",
-        fetch=True
-    )
-    
-    if project_id_nullable and project_id_nullable[0][0] == 'YES':
+    if column_is_nullable('deliverable_upload', 'project_id'):
         # Get default project id
         projects = execute_sql("SELECT id FROM project ORDER BY id LIMIT 1", fetch=True)
         if projects:
@@ -97,12 +111,7 @@ def update_deliverable_upload_table():
             print(f"Made project_id not nullable (default: {default_project_id})")
     
     # Make discipline not nullable if it is
-    discipline_nullable = execute_sql(
-        "SELECT is_nullable FROM information_schema.columns WHERE table_name = 'deliverable_upload' AND column_name = 'discipline'",
-        fetch=True
-    )
-    
-    if discipline_nullable and discipline_nullable[0][0] == 'YES':
+    if column_is_nullable('deliverable_upload', 'discipline'):
         execute_sql("UPDATE deliverable_upload SET discipline = 'General' WHERE discipline IS NULL")
         execute_sql("ALTER TABLE deliverable_upload ALTER COLUMN discipline SET NOT NULL")
         print("Made discipline not nullable")
@@ -114,12 +123,7 @@ def update_excel_template_table():
     print("Modifying excel_template table...")
     
     # Check if version column exists
-    version_exists = execute_sql(
-        "SELECT column_name FROM information_schema.columns WHERE table_name = 'excel_template' AND column_name = 'version'",
-        fetch=True
-    )
-    
-    if not version_exists:
+    if not column_exists('excel_template', 'version'):
         execute_sql("ALTER TABLE excel_template ADD COLUMN version INTEGER DEFAULT 1")
         execute_sql("UPDATE excel_template SET version = 1")
         execute_sql("ALTER TABLE excel_template ALTER COLUMN version SET NOT NULL")
@@ -134,12 +138,7 @@ def create_deliverable_list_tables():
     print("Creating deliverable list tables...")
     
     # Check if deliverable_list table exists
-    deliverable_list_exists = execute_sql(
-        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'deliverable_list')",
-        fetch=True
-    )
-    
-    if not deliverable_list_exists or not deliverable_list_exists[0][0]:
+    if not table_exists('deliverable_list'):
         execute_sql("""
             CREATE TABLE deliverable_list (
                 id SERIAL PRIMARY KEY,
@@ -160,12 +159,7 @@ def create_deliverable_list_tables():
         print("deliverable_list table already exists")
     
     # Check if deliverable_list_item table exists
-    deliverable_list_item_exists = execute_sql(
-        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'deliverable_list_item')",
-        fetch=True
-    )
-    
-    if not deliverable_list_item_exists or not deliverable_list_item_exists[0][0]:
+    if not table_exists('deliverable_list_item'):
         execute_sql("""
             CREATE TABLE deliverable_list_item (
                 id SERIAL PRIMARY KEY,
@@ -193,12 +187,7 @@ def create_standard_template_tables():
     print("Creating standard template tables...")
     
     # Check if standard_deliverable_template table exists
-    std_template_exists = execute_sql(
-        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'standard_deliverable_template')",
-        fetch=True
-    )
-    
-    if not std_template_exists or not std_template_exists[0][0]:
+    if not table_exists('standard_deliverable_template'):
         execute_sql("""
             CREATE TABLE standard_deliverable_template (
                 id SERIAL PRIMARY KEY,
@@ -217,12 +206,7 @@ def create_standard_template_tables():
         print("standard_deliverable_template table already exists")
     
     # Check if standard_deliverable_item table exists
-    std_item_exists = execute_sql(
-        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'standard_deliverable_item')",
-        fetch=True
-    )
-    
-    if not std_item_exists or not std_item_exists[0][0]:
+    if not table_exists('standard_deliverable_item'):
         execute_sql("""
             CREATE TABLE standard_deliverable_item (
                 id SERIAL PRIMARY KEY,
@@ -245,9 +229,8 @@ def run_migration():
     """Run the migration script"""
     print("Starting database migration for Deliverables Estimation module...")
     
-    # Test database connection
-    test = execute_sql("SELECT 1", fetch=True)
-    if not test:
+    # Load the schema snapshot; this also tests the database connection
+    if not load_schema_cache():
         print("Failed to connect to database. Aborting migration.")
         return False
     